@@ -8,11 +8,93 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pulp import *
-import json
+import os
+import io
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from ifood_optimizer import IFoodDeliveryOptimizer, serializar_json, solver_padrao
+import logging
 import warnings
 warnings.filterwarnings('ignore')
 
+# Mensagens de laços internos vão para o logger (silencioso por padrão)
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+def _gravar_json_incremental(f, valor, niveis=2, recuo=b''):
+    """
+    Grava um dicionário em JSON item a item, serializando apenas um valor por vez
+    (até 'niveis' níveis de aninhamento) em vez do documento inteiro em memória
+    Cada valor é recuado até o seu nível, com o mesmo indent=2 do documento inteiro
+    """
+    if niveis == 0 or not isinstance(valor, dict):
+        # Strings JSON não contêm quebras de linha: toda quebra é da indentação
+        f.write(serializar_json(valor).replace(b'\n', b'\n' + recuo))
+        return
+    if not valor:
+        f.write(b'{}')
+        return
+    
+    recuo_itens = recuo + b'  '
+    f.write(b'{')
+    for n, (chave, item) in enumerate(valor.items()):
+        f.write(b',\n' if n else b'\n')
+        f.write(recuo_itens + serializar_json(str(chave)) + b': ')
+        _gravar_json_incremental(f, item, niveis - 1, recuo_itens)
+    f.write(b'\n' + recuo + b'}')
+
+def _saida(verbose):
+    """
+    Contexto que descarta as mensagens impressas pelo otimizador quando verbose=False
+    """
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+# Otimizador e solver de cada processo do pool da análise de sensibilidade
+_otimizador_worker = None
+_solver_worker = None
+
+def _init_worker(restaurantes_df, entregadores_df, pedidos_df):
+    """
+    Inicializa um processo do pool: cria um otimizador próprio com os dados
+    já carregados e constrói o modelo uma única vez (o modelo PuLP não é enviado entre processos)
+    A construção é sempre silenciosa: repetida em cada processo, não acrescenta nada à saída
+    """
+    global _otimizador_worker, _solver_worker
+    
+    with _saida(False):
+        otimizador = IFoodDeliveryOptimizer()
+        otimizador.restaurantes = restaurantes_df
+        otimizador.entregadores = entregadores_df
+        otimizador.pedidos = pedidos_df
+        otimizador.preprocessar_dados()
+        otimizador.criar_modelo()
+    
+    _otimizador_worker = otimizador
+    _solver_worker = solver_padrao(msg=0, timeLimit=300)
+
+def _solve_with_cap(cap):
+    """
+    Resolve o modelo do processo atual com todas as capacidades iguais a cap
+    Retorna o resultado (None se não resolvido) e as mensagens do otimizador, que o processo
+    principal imprime em ordem de capacidade em vez de misturar a saída dos processos
+    """
+    mensagens = io.StringIO()
+    with contextlib.redirect_stdout(mensagens):
+        _otimizador_worker.set_capacity(cap)
+        resolvido = _otimizador_worker.resolver_modelo(_solver_worker)
+    if not resolvido:
+        return None, mensagens.getvalue()
+    
+    resultado = _otimizador_worker.resultado
+    return {
+        'capacidade': cap,
+        'tempo_total': resultado['tempo_total'],
+        'tempo_medio': resultado['tempo_medio'],
+        'entregadores_usados': resultado['num_entregadores_usados'],
+        'valor_objetivo': resultado['valor_objetivo']
+    }, mensagens.getvalue()
+
 class IFoodAdvancedAnalyzer:
     def __init__(self, otimizador_base):
         """
@@ -20,42 +102,101 @@ class IFoodAdvancedAnalyzer:
         """
         self.otimizador = otimizador_base
         self.analises = {}
-        
-    def analise_sensibilidade_capacidade(self, range_capacidade=(1, 10)):
+    
+    @staticmethod
+    def _log(texto, verbose):
+        """
+        Imprime uma mensagem da análise apenas em modo verbose
+        """
+        if verbose:
+            print(texto)
+    
+    def _salvar_estado(self):
+        """
+        Guarda capacidades, solução (valores de x), status e resultado do modelo principal,
+        para que um cenário resolvido sobre o mesmo modelo possa ser desfeito com _restaurar_estado
+        """
+        otimizador = self.otimizador
+        return (
+            otimizador.capacidades_atuais.copy(),
+            [[var.varValue for var in linha] for linha in otimizador.x_vars],
+            otimizador.modelo.status,
+            otimizador.resultado,
+        )
+    
+    def _restaurar_estado(self, estado):
+        """
+        Restaura o estado guardado por _salvar_estado
+        """
+        capacidades, valores, status, resultado = estado
+        self.otimizador.set_capacity(capacidades)
+        for linha, valores_linha in zip(self.otimizador.x_vars, valores):
+            for var, valor in zip(linha, valores_linha):
+                var.varValue = valor
+        self.otimizador.modelo.status = status
+        self.otimizador.resultado = resultado
+        
+    def analise_sensibilidade_capacidade(self, range_capacidade=(1, 10), max_workers=None, verbose=False):
         """
         Análise de sensibilidade variando a capacidade dos entregadores
+        Os cenários são independentes e resolvidos em paralelo (max_workers=1 resolve em sequência)
         """
-        print("Executando análise de sensibilidade - Capacidade...")
-        
-        resultados = []
-        capacidade_original = self.otimizador.entregadores['Capacidade Máxima'].copy()
-        
-        for cap in range(range_capacidade[0], range_capacidade[1] + 1):
-            print(f"  Testando capacidade: {cap}")
+        self._log("Executando análise de sensibilidade - Capacidade...", verbose)
+        
+        capacidades = list(range(range_capacidade[0], range_capacidade[1] + 1))
+        if max_workers is None:
+            max_workers = min(len(capacidades), os.cpu_count() or 1)
+        
+        if max_workers > 1:
+            # Cada processo monta seu próprio modelo e apenas altera o RHS entre resoluções
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(self.otimizador.restaurantes, self.otimizador.entregadores, self.otimizador.pedidos)
+            ) as executor:
+                resultados = []
+                for resultado, mensagens in executor.map(_solve_with_cap, capacidades):
+                    if verbose:
+                        print(mensagens, end='')
+                    if resultado is not None:
+                        resultados.append(resultado)
+        else:
+            resultados = []
+            
+            # Modelo construído uma única vez; apenas o RHS da capacidade muda
+            # Capacidades, solução e resultado atuais são restaurados ao final, como no caminho paralelo
+            with _saida(verbose):
+                self.otimizador.criar_modelo_parametrizado()
+            estado_original = self._salvar_estado()
+            solver = solver_padrao(msg=0, timeLimit=300)
             
-            # Alterar capacidade temporariamente
-            self.otimizador.entregadores['Capacidade Máxima'] = cap
+            for cap in capacidades:
+                logger.debug("Testando capacidade: %s", cap)
+                
+                with _saida(verbose):
+                    # Alterar capacidade temporariamente
+                    self.otimizador.set_capacity(cap)
+                    
+                    # Resolver novamente o mesmo modelo
+                    resolvido = self.otimizador.resolver_modelo(solver)
+                if resolvido:
+                    resultados.append({
+                        'capacidade': cap,
+                        'tempo_total': self.otimizador.resultado['tempo_total'],
+                        'tempo_medio': self.otimizador.resultado['tempo_medio'],
+                        'entregadores_usados': self.otimizador.resultado['num_entregadores_usados'],
+                        'valor_objetivo': self.otimizador.resultado['valor_objetivo']
+                    })
             
-            # Recriar e resolver modelo
-            self.otimizador.criar_modelo()
-            if self.otimizador.resolver_modelo():
-                resultados.append({
-                    'capacidade': cap,
-                    'tempo_total': self.otimizador.resultado['tempo_total'],
-                    'tempo_medio': self.otimizador.resultado['tempo_medio'],
-                    'entregadores_usados': self.otimizador.resultado['num_entregadores_usados'],
-                    'valor_objetivo': self.otimizador.resultado['valor_objetivo']
-                })
-        
-        # Restaurar capacidade original
-        self.otimizador.entregadores['Capacidade Máxima'] = capacidade_original
+            # Restaurar capacidade, solução e resultado originais
+            self._restaurar_estado(estado_original)
         
         self.analises['sensibilidade_capacidade'] = pd.DataFrame(resultados)
-        print(f"✓ Análise concluída com {len(resultados)} pontos")
+        self._log(f"✓ Análise concluída com {len(resultados)} pontos", verbose)
         
         return self.analises['sensibilidade_capacidade']
     
-    def analise_distribuicao_tempos(self):
+    def analise_distribuicao_tempos(self, verbose=False):
         """
         Análise da distribuição de tempos de entrega
         """
@@ -63,65 +204,65 @@ class IFoodAdvancedAnalyzer:
             print("Execute primeiro a otimização principal!")
             return None
             
-        print("Analisando distribuição de tempos...")
+        self._log("Analisando distribuição de tempos...", verbose)
         
-        tempos = [a['tempo_entrega'] for a in self.otimizador.resultado['alocacoes']]
+        tempos = self.otimizador.resultado['alocacoes_df']['tempo_entrega'].to_numpy(dtype=np.float64)
+        # Um único array ordenado serve para extremos, quartis e faixas
+        tempos_ordenados = np.sort(tempos)
+        q25, mediana, q75 = np.percentile(tempos_ordenados, [25, 50, 75])
         
         analise = {
             'media': np.mean(tempos),
-            'mediana': np.median(tempos),
+            'mediana': mediana,
             'desvio_padrao': np.std(tempos),
-            'minimo': np.min(tempos),
-            'maximo': np.max(tempos),
-            'q25': np.percentile(tempos, 25),
-            'q75': np.percentile(tempos, 75),
-            'tempos_detalhados': tempos
+            'minimo': tempos_ordenados[0],
+            'maximo': tempos_ordenados[-1],
+            'q25': q25,
+            'q75': q75,
+            'tempos_detalhados': tempos.tolist()
         }
         
         # Classificação por faixas de tempo
-        faixas = {
-            'muito_rapido': sum([1 for t in tempos if t <= 30]),
-            'rapido': sum([1 for t in tempos if 30 < t <= 45]),
-            'normal': sum([1 for t in tempos if 45 < t <= 60]),
-            'lento': sum([1 for t in tempos if 60 < t <= 90]),
-            'muito_lento': sum([1 for t in tempos if t > 90])
-        }
+        # Com os tempos ordenados, cada limite é uma busca binária; side='right'
+        # mantém as faixas fechadas à direita (t <= 30, 30 < t <= 45, ...)
+        limites = np.searchsorted(tempos_ordenados, [30.0, 45.0, 60.0, 90.0], side='right')
+        contagens = np.diff(np.concatenate(([0], limites, [len(tempos_ordenados)])))
+        nomes_faixas = ['muito_rapido', 'rapido', 'normal', 'lento', 'muito_lento']
+        faixas = {nome: int(contagem) for nome, contagem in zip(nomes_faixas, contagens)}
         
         analise['distribuicao_faixas'] = faixas
         self.analises['distribuicao_tempos'] = analise
         
-        print("✓ Análise de distribuição concluída")
+        self._log("✓ Análise de distribuição concluída", verbose)
         return analise
     
-    def analise_utilizacao_entregadores(self):
+    def analise_utilizacao_entregadores(self, incluir_pedidos=False, verbose=False):
         """
         Análise da utilização dos entregadores
+        A lista de IDs dos pedidos de cada entregador só é montada se incluir_pedidos=True
         """
         if self.otimizador.resultado is None:
             print("Execute primeiro a otimização principal!")
             return None
             
-        print("Analisando utilização de entregadores...")
-        
-        # Contar pedidos por entregador
-        utilizacao = {}
-        for alocacao in self.otimizador.resultado['alocacoes']:
-            ent_id = alocacao['entregador_id']
-            if ent_id not in utilizacao:
-                utilizacao[ent_id] = {
-                    'num_pedidos': 0,
-                    'tempo_total': 0,
-                    'valor_total': 0,
-                    'pedidos': []
-                }
-            
-            utilizacao[ent_id]['num_pedidos'] += 1
-            utilizacao[ent_id]['tempo_total'] += alocacao['tempo_entrega']
-            utilizacao[ent_id]['valor_total'] += alocacao['valor_pedido']
-            utilizacao[ent_id]['pedidos'].append(alocacao)
+        self._log("Analisando utilização de entregadores...", verbose)
+        
+        # Contar pedidos por entregador (agregação feita pelo pandas)
+        df_aloc = self.otimizador.resultado['alocacoes_df']
+        g = df_aloc.groupby('entregador_id', sort=False).agg(
+            num_pedidos=('pedido_id', 'count'),
+            tempo_total=('tempo_entrega', 'sum'),
+            valor_total=('valor_pedido', 'sum')
+        )
+        utilizacao = g.to_dict(orient='index')
+        
+        if incluir_pedidos:
+            # Apenas os IDs: os detalhes de cada pedido já estão em resultado['alocacoes']
+            for ent_id, pedidos_ent in df_aloc.groupby('entregador_id', sort=False):
+                utilizacao[ent_id]['pedidos'] = pedidos_ent['pedido_id'].tolist()
         
         # Estatísticas de utilização
-        pedidos_por_entregador = [u['num_pedidos'] for u in utilizacao.values()]
+        pedidos_por_entregador = g['num_pedidos'].to_numpy()
         
         analise = {
             'entregadores_utilizados': len(utilizacao),
@@ -136,13 +277,13 @@ class IFoodAdvancedAnalyzer:
         
         self.analises['utilizacao_entregadores'] = analise
         
-        print(f"✓ {analise['entregadores_utilizados']}/{analise['entregadores_disponivelis']} entregadores utilizados")
-        print(f"  Taxa de utilização: {analise['taxa_utilizacao']:.1%}")
-        print(f"  Média de pedidos por entregador: {analise['media_pedidos_por_entregador']:.1f}")
+        self._log(f"✓ {analise['entregadores_utilizados']}/{analise['entregadores_disponivelis']} entregadores utilizados", verbose)
+        self._log(f"  Taxa de utilização: {analise['taxa_utilizacao']:.1%}", verbose)
+        self._log(f"  Média de pedidos por entregador: {analise['media_pedidos_por_entregador']:.1f}", verbose)
         
         return analise
     
-    def analise_prioridades(self):
+    def analise_prioridades(self, verbose=False):
         """
         Análise do impacto das prioridades dos pedidos
         """
@@ -150,122 +291,123 @@ class IFoodAdvancedAnalyzer:
             print("Execute primeiro a otimização principal!")
             return None
             
-        print("Analisando impacto das prioridades...")
-        
-        # Agrupar por prioridade
-        por_prioridade = {}
-        for alocacao in self.otimizador.resultado['alocacoes']:
-            prio = alocacao['prioridade']
-            if prio not in por_prioridade:
-                por_prioridade[prio] = {
-                    'count': 0,
-                    'tempos': [],
-                    'valores': []
-                }
-            
-            por_prioridade[prio]['count'] += 1
-            por_prioridade[prio]['tempos'].append(alocacao['tempo_entrega'])
-            por_prioridade[prio]['valores'].append(alocacao['valor_pedido'])
-        
-        # Calcular estatísticas por prioridade
-        analise = {}
-        for prio, dados in por_prioridade.items():
-            nome_prio = {1: 'Normal', 2: 'Prioritário', 3: 'Expresso'}.get(prio, f'Prioridade_{prio}')
-            
-            analise[nome_prio] = {
-                'quantidade': dados['count'],
-                'tempo_medio': np.mean(dados['tempos']),
-                'tempo_min': np.min(dados['tempos']),
-                'tempo_max': np.max(dados['tempos']),
-                'valor_medio': np.mean(dados['valores']),
-                'valor_total': np.sum(dados['valores'])
-            }
+        self._log("Analisando impacto das prioridades...", verbose)
+        
+        # Agrupar por prioridade e calcular as estatísticas em uma única agregação
+        df_aloc = self.otimizador.resultado['alocacoes_df']
+        g = df_aloc.groupby('prioridade', sort=False).agg(
+            quantidade=('pedido_id', 'size'),
+            tempo_medio=('tempo_entrega', 'mean'),
+            tempo_min=('tempo_entrega', 'min'),
+            tempo_max=('tempo_entrega', 'max'),
+            valor_medio=('valor_pedido', 'mean'),
+            valor_total=('valor_pedido', 'sum')
+        )
+        
+        nomes_prioridade = {1: 'Normal', 2: 'Prioritário', 3: 'Expresso'}
+        analise = {
+            nomes_prioridade.get(prio, f'Prioridade_{prio}'): stats
+            for prio, stats in g.to_dict(orient='index').items()
+        }
         
         self.analises['analise_prioridades'] = analise
         
-        print("✓ Análise de prioridades concluída")
+        self._log("✓ Análise de prioridades concluída", verbose)
         for nome, stats in analise.items():
-            print(f"  {nome}: {stats['quantidade']} pedidos, tempo médio {stats['tempo_medio']:.1f}min")
+            self._log(f"  {nome}: {stats['quantidade']} pedidos, tempo médio {stats['tempo_medio']:.1f}min", verbose)
         
         return analise
     
-    def otimizacao_com_restricoes_tempo(self, tempo_max_expresso=30, tempo_max_prioritario=45):
+    def otimizacao_com_restricoes_tempo(self, tempo_max_expresso=30, tempo_max_prioritario=45, verbose=False):
         """
         Versão do modelo com restrições de tempo por prioridade
         """
-        print(f"Otimizando com restrições de tempo:")
-        print(f"  Expresso: ≤ {tempo_max_expresso} min")
-        print(f"  Prioritário: ≤ {tempo_max_prioritario} min")
+        self._log("Otimizando com restrições de tempo:", verbose)
+        self._log(f"  Expresso: ≤ {tempo_max_expresso} min", verbose)
+        self._log(f"  Prioritário: ≤ {tempo_max_prioritario} min", verbose)
         
         # Criar novo modelo baseado no original
         I = range(len(self.otimizador.entregadores))
         J = range(len(self.otimizador.pedidos))
         
+        # Colunas extraídas uma única vez (evita .iloc dentro dos laços)
+        prio_arr = self.otimizador.pedidos['prioridade'].to_numpy()
+        ped_id = self.otimizador.pedidos['pedido_id'].to_numpy()
+        cap = self.otimizador.entregadores['Capacidade Máxima'].to_numpy()
+        ent_id = self.otimizador.entregadores['ID'].to_numpy()
+        
+        # coef[i,j] = deslocamento até o restaurante + preparo + deslocamento até o cliente
+        # É a mesma matriz de tempos do modelo principal (criado aqui se ainda não existir)
+        with _saida(verbose):
+            self.otimizador.criar_modelo_parametrizado()
+        coef = self.otimizador.tempos_pares
+        
+        # Limite de tempo de cada pedido (sem limite para pedidos normais)
+        tempo_max = np.full(len(J), np.inf)
+        tempo_max[prio_arr == 3] = tempo_max_expresso
+        tempo_max[prio_arr == 2] = tempo_max_prioritario
+        
+        # Só existem variáveis para pares (i,j) capazes de cumprir o limite do pedido
+        viavel = coef <= tempo_max[None, :]
+        if not viavel.any(axis=0).all():
+            print("✗ Problema infeasível com as restrições de tempo especificadas")
+            return None
+        
         modelo_restrito = LpProblem("IFood_Delivery_Restricted", LpMinimize)
         
         # Variáveis
         x = {}
-        for i in I:
-            for j in J:
-                x[i,j] = LpVariable(f"x_{i}_{j}", cat='Binary')
-        
-        T = {}
+        entregadores_do_pedido = {j: [] for j in J}
+        pedidos_do_entregador = {i: [] for i in I}
+        for i, j in zip(*np.nonzero(viavel)):
+            i, j = int(i), int(j)
+            x[i,j] = LpVariable(f"x_{i}_{j}", cat='Binary')
+            entregadores_do_pedido[j].append(i)
+            pedidos_do_entregador[i].append(j)
+        
+        # Função objetivo: Σ p_j * T_j com T_j = Σ coef[i,j] * x[i,j] já substituído
+        # LpAffineExpression recebe pares (variável, coeficiente) diretamente,
+        # o que é bem mais rápido que lpSum sobre produtos
+        modelo_restrito += LpAffineExpression(
+            ((var, float(prio_arr[j] * coef[i, j])) for (i, j), var in x.items())
+        )
+        
+        # Restrições originais (somando apenas sobre os pares viáveis)
         for j in J:
-            T[j] = LpVariable(f"T_{j}", lowBound=0)
-        
-        # Função objetivo
-        modelo_restrito += lpSum([T[j] * self.otimizador.pedidos.iloc[j]['prioridade'] for j in J])
-        
-        # Restrições originais
-        for j in J:
-            modelo_restrito += lpSum([x[i,j] for i in I]) == 1
+            modelo_restrito += LpAffineExpression(((x[i,j], 1) for i in entregadores_do_pedido[j])) == 1
         
         for i in I:
-            capacidade_max = self.otimizador.entregadores.iloc[i]['Capacidade Máxima']
-            modelo_restrito += lpSum([x[i,j] for j in J]) <= capacidade_max
-        
-        for j in J:
-            tempo_preparo = self.otimizador.pedidos.iloc[j]['tempo_preparo_min']
-            tempo_deslocamento_cliente = self.otimizador.pedidos.iloc[j]['tempo_deslocamento_min']
-            
-            tempo_total_expr = lpSum([
-                x[i,j] * (self.otimizador.calcular_tempo_deslocamento(i, j) + tempo_preparo + tempo_deslocamento_cliente)
-                for i in I
-            ])
-            
-            modelo_restrito += T[j] == tempo_total_expr
+            if pedidos_do_entregador[i]:
+                modelo_restrito += LpAffineExpression(((x[i,j], 1) for j in pedidos_do_entregador[i])) <= cap[i]
         
-        # Novas restrições de tempo por prioridade
-        for j in J:
-            prioridade = self.otimizador.pedidos.iloc[j]['prioridade']
-            if prioridade == 3:  # Expresso
-                modelo_restrito += T[j] <= tempo_max_expresso
-            elif prioridade == 2:  # Prioritário
-                modelo_restrito += T[j] <= tempo_max_prioritario
+        # As restrições de tempo por prioridade não precisam de linhas no modelo:
+        # cada pedido recebe exatamente um entregador e só existem pares viáveis,
+        # então T_j <= tempo_max[j] vale para qualquer solução
         
         # Resolver
-        solver = GLPK_CMD(msg=0)
+        # CBC escala bem melhor que o GLPK para o problema inteiro com restrições de tempo
+        solver = PULP_CBC_CMD(msg=0, threads=os.cpu_count())
         status = modelo_restrito.solve(solver)
         
         if status == LpStatusOptimal:
-            print("✓ Solução ótima encontrada com restrições de tempo!")
+            self._log("✓ Solução ótima encontrada com restrições de tempo!", verbose)
             
             # Extrair resultados
+            # T_j calculado a partir da alocação escolhida
             alocacoes_restritas = []
-            for i in I:
-                for j in J:
-                    if x[i,j].value() == 1:
-                        alocacoes_restritas.append({
-                            'entregador_id': self.otimizador.entregadores.iloc[i]['ID'],
-                            'pedido_id': self.otimizador.pedidos.iloc[j]['pedido_id'],
-                            'prioridade': self.otimizador.pedidos.iloc[j]['prioridade'],
-                            'tempo_entrega': T[j].value()
-                        })
+            for (i, j), var in x.items():
+                if var.value() > 0.5:
+                    alocacoes_restritas.append({
+                        'entregador_id': ent_id[i],
+                        'pedido_id': ped_id[j],
+                        'prioridade': prio_arr[j],
+                        'tempo_entrega': float(coef[i, j])
+                    })
             
             resultado_restrito = {
                 'valor_objetivo': value(modelo_restrito.objective),
                 'alocacoes': alocacoes_restritas,
-                'tempo_total': sum([T[j].value() for j in J]),
+                'tempo_total': sum(a['tempo_entrega'] for a in alocacoes_restritas),
                 'restricoes_atendidas': True
             }
             
@@ -276,11 +418,46 @@ class IFoodAdvancedAnalyzer:
             print("✗ Problema infeasível com as restrições de tempo especificadas")
             return None
     
-    def comparar_cenarios(self):
+    def _solucao_inicial_viavel(self, capacidades):
+        """
+        Ajusta a solução atual do modelo às capacidades informadas e a grava como valor
+        inicial das variáveis: os pedidos excedentes de cada entregador vão, um a um, para o
+        entregador com folga que menos aumenta o custo.
+        Retorna False se não houver solução completa ou folga suficiente (sem solução inicial)
+        """
+        x = self.otimizador.x_vars
+        sol = np.array([[var.varValue or 0 for var in linha] for linha in x]) > 0.5
+        if sol.size == 0 or not (sol.sum(axis=0) == 1).all():
+            return False
+        
+        capacidades = np.asarray(capacidades)
+        if capacidades.sum() < sol.shape[1]:
+            return False
+        
+        custo = self.otimizador.custo_pares
+        alocado = sol.argmax(axis=0)  # entregador de cada pedido
+        carga = np.bincount(alocado, minlength=len(capacidades))
+        for i in np.nonzero(carga > capacidades)[0]:
+            while carga[i] > capacidades[i]:
+                pedidos_i = np.nonzero(alocado == i)[0]
+                com_folga = np.nonzero(carga < capacidades)[0]
+                # Aumento de custo de mover cada pedido de i para cada entregador com folga
+                delta = custo[np.ix_(com_folga, pedidos_i)] - custo[i, pedidos_i][None, :]
+                k, j = np.unravel_index(np.argmin(delta), delta.shape)
+                alocado[pedidos_i[j]] = com_folga[k]
+                carga[i] -= 1
+                carga[com_folga[k]] += 1
+        
+        for i, linha in enumerate(x):
+            for j, var in enumerate(linha):
+                var.setInitialValue(1 if alocado[j] == i else 0)
+        return True
+    
+    def comparar_cenarios(self, verbose=False):
         """
         Compara diferentes cenários de otimização
         """
-        print("Comparando cenários de otimização...")
+        self._log("Comparando cenários de otimização...", verbose)
         
         cenarios = {}
         
@@ -302,32 +479,41 @@ class IFoodAdvancedAnalyzer:
             }
         
         # Cenário 3: Capacidade reduzida
-        print("  Testando cenário com capacidade reduzida...")
-        cap_original = self.otimizador.entregadores['Capacidade Máxima'].copy()
-        self.otimizador.entregadores['Capacidade Máxima'] = self.otimizador.entregadores['Capacidade Máxima'] // 2 + 1
-        
-        self.otimizador.criar_modelo()
-        if self.otimizador.resolver_modelo():
+        logger.debug("Testando cenário com capacidade reduzida")
+        # O cenário é resolvido sobre o modelo principal: capacidades, solução e resultado
+        # são guardados e restaurados ao final, como na análise de sensibilidade
+        with _saida(verbose):
+            self.otimizador.criar_modelo_parametrizado()
+        estado_original = self._salvar_estado()
+        self.otimizador.set_capacity(self.otimizador.capacidades_atuais // 2 + 1)
+        
+        # O modelo é o mesmo já resolvido: a solução atual, ajustada às novas capacidades,
+        # serve de solução inicial (MIP start) para o CBC
+        warm_start = self._solucao_inicial_viavel(self.otimizador.capacidades_atuais)
+        solver = PULP_CBC_CMD(msg=0, warmStart=warm_start, timeLimit=300)
+        with _saida(verbose):
+            resolvido = self.otimizador.resolver_modelo(solver)
+        if resolvido:
             cenarios['Capacidade_Reduzida'] = {
                 'tempo_total': self.otimizador.resultado['tempo_total'],
                 'tempo_medio': self.otimizador.resultado['tempo_medio'],
                 'entregadores_usados': self.otimizador.resultado['num_entregadores_usados']
             }
         
-        # Restaurar capacidade
-        self.otimizador.entregadores['Capacidade Máxima'] = cap_original
+        # Restaurar capacidade, solução e resultado originais
+        self._restaurar_estado(estado_original)
         
         self.analises['comparacao_cenarios'] = cenarios
         
-        print("✓ Comparação de cenários concluída")
-        print("\nRESUMO DOS CENÁRIOS:")
-        print("-" * 50)
+        self._log("✓ Comparação de cenários concluída", verbose)
+        self._log("\nRESUMO DOS CENÁRIOS:", verbose)
+        self._log("-" * 50, verbose)
         for nome, dados in cenarios.items():
-            print(f"{nome}:")
-            print(f"  Tempo total: {dados['tempo_total']:.1f} min")
-            print(f"  Tempo médio: {dados['tempo_medio']:.1f} min")
-            print(f"  Entregadores: {dados['entregadores_usados']}")
-            print()
+            self._log(f"{nome}:", verbose)
+            self._log(f"  Tempo total: {dados['tempo_total']:.1f} min", verbose)
+            self._log(f"  Tempo médio: {dados['tempo_medio']:.1f} min", verbose)
+            self._log(f"  Entregadores: {dados['entregadores_usados']}", verbose)
+            self._log("", verbose)
         
         return cenarios
     
@@ -336,64 +522,75 @@ class IFoodAdvancedAnalyzer:
         Gera relatório completo com todas as análises
         """
         print("Gerando relatório completo...")
+        timestamp = datetime.now().isoformat()
+        
+        resultado_original = self.otimizador.resultado
+        if resultado_original is not None:
+            # O DataFrame colunar não é serializável; as alocações já estão em 'alocacoes'
+            resultado_original = {k: v for k, v in resultado_original.items() if k != 'alocacoes_df'}
         
         relatorio = {
-            'timestamp': datetime.now().isoformat(),
-            'otimizacao_original': self.otimizador.resultado,
+            'timestamp': timestamp,
+            'otimizacao_original': resultado_original,
             'analises_avancadas': self.analises
         }
         
-        # Salvar JSON
-        with open(arquivo_saida, 'w', encoding='utf-8') as f:
-            json.dump(relatorio, f, indent=2, ensure_ascii=False, default=str)
+        # Salvar JSON de forma incremental (cada análise é serializada separadamente)
+        with open(arquivo_saida, 'wb') as f:
+            _gravar_json_incremental(f, relatorio)
+            f.write(b'\n')
         
         # Gerar relatório em texto
+        # As linhas são acumuladas e gravadas com uma única escrita
+        partes = []
+        partes.append("RELATÓRIO COMPLETO - OTIMIZAÇÃO IFOOD JUIZ DE FORA\n")
+        partes.append("=" * 60 + "\n\n")
+        
+        # Resumo executivo
+        partes.append("RESUMO EXECUTIVO\n")
+        partes.append("-" * 20 + "\n")
+        if self.otimizador.resultado:
+            partes.append(f"Tempo total de entrega: {self.otimizador.resultado['tempo_total']:.1f} min\n")
+            partes.append(f"Tempo médio por pedido: {self.otimizador.resultado['tempo_medio']:.1f} min\n")
+            partes.append(f"Entregadores utilizados: {self.otimizador.resultado['num_entregadores_usados']}\n")
+            partes.append(f"Total de pedidos: {len(self.otimizador.resultado['alocacoes'])}\n\n")
+        
+        # Análises detalhadas
+        if 'distribuicao_tempos' in self.analises:
+            dist = self.analises['distribuicao_tempos']
+            partes.append("DISTRIBUIÇÃO DE TEMPOS\n")
+            partes.append("-" * 25 + "\n")
+            partes.append(f"Tempo mínimo: {dist['minimo']:.1f} min\n")
+            partes.append(f"Tempo máximo: {dist['maximo']:.1f} min\n")
+            partes.append(f"Mediana: {dist['mediana']:.1f} min\n")
+            partes.append(f"Desvio padrão: {dist['desvio_padrao']:.1f} min\n\n")
+            
+            partes.append("Distribuição por faixas:\n")
+            for faixa, count in dist['distribuicao_faixas'].items():
+                partes.append(f"  {faixa}: {count} pedidos\n")
+            partes.append("\n")
+        
+        if 'utilizacao_entregadores' in self.analises:
+            util = self.analises['utilizacao_entregadores']
+            partes.append("UTILIZAÇÃO DE ENTREGADORES\n")
+            partes.append("-" * 30 + "\n")
+            partes.append(f"Taxa de utilização: {util['taxa_utilizacao']:.1%}\n")
+            partes.append(f"Média de pedidos por entregador: {util['media_pedidos_por_entregador']:.1f}\n")
+            partes.append(f"Desvio padrão: {util['desvio_pedidos']:.1f}\n\n")
+        
+        if 'analise_prioridades' in self.analises:
+            prio = self.analises['analise_prioridades']
+            partes.append("ANÁLISE POR PRIORIDADE\n")
+            partes.append("-" * 25 + "\n")
+            for nome, stats in prio.items():
+                partes.append(f"{nome}:\n")
+                partes.append(f"  Quantidade: {stats['quantidade']} pedidos\n")
+                partes.append(f"  Tempo médio: {stats['tempo_medio']:.1f} min\n")
+                partes.append(f"  Valor total: R$ {stats['valor_total']:.2f}\n\n")
+        
         arquivo_txt = arquivo_saida.replace('.json', '.txt')
         with open(arquivo_txt, 'w', encoding='utf-8') as f:
-            f.write("RELATÓRIO COMPLETO - OTIMIZAÇÃO IFOOD JUIZ DE FORA\n")
-            f.write("=" * 60 + "\n\n")
-            
-            # Resumo executivo
-            f.write("RESUMO EXECUTIVO\n")
-            f.write("-" * 20 + "\n")
-            if self.otimizador.resultado:
-                f.write(f"Tempo total de entrega: {self.otimizador.resultado['tempo_total']:.1f} min\n")
-                f.write(f"Tempo médio por pedido: {self.otimizador.resultado['tempo_medio']:.1f} min\n")
-                f.write(f"Entregadores utilizados: {self.otimizador.resultado['num_entregadores_usados']}\n")
-                f.write(f"Total de pedidos: {len(self.otimizador.resultado['alocacoes'])}\n\n")
-            
-            # Análises detalhadas
-            if 'distribuicao_tempos' in self.analises:
-                dist = self.analises['distribuicao_tempos']
-                f.write("DISTRIBUIÇÃO DE TEMPOS\n")
-                f.write("-" * 25 + "\n")
-                f.write(f"Tempo mínimo: {dist['minimo']:.1f} min\n")
-                f.write(f"Tempo máximo: {dist['maximo']:.1f} min\n")
-                f.write(f"Mediana: {dist['mediana']:.1f} min\n")
-                f.write(f"Desvio padrão: {dist['desvio_padrao']:.1f} min\n\n")
-                
-                f.write("Distribuição por faixas:\n")
-                for faixa, count in dist['distribuicao_faixas'].items():
-                    f.write(f"  {faixa}: {count} pedidos\n")
-                f.write("\n")
-            
-            if 'utilizacao_entregadores' in self.analises:
-                util = self.analises['utilizacao_entregadores']
-                f.write("UTILIZAÇÃO DE ENTREGADORES\n")
-                f.write("-" * 30 + "\n")
-                f.write(f"Taxa de utilização: {util['taxa_utilizacao']:.1%}\n")
-                f.write(f"Média de pedidos por entregador: {util['media_pedidos_por_entregador']:.1f}\n")
-                f.write(f"Desvio padrão: {util['desvio_pedidos']:.1f}\n\n")
-            
-            if 'analise_prioridades' in self.analises:
-                prio = self.analises['analise_prioridades']
-                f.write("ANÁLISE POR PRIORIDADE\n")
-                f.write("-" * 25 + "\n")
-                for nome, stats in prio.items():
-                    f.write(f"{nome}:\n")
-                    f.write(f"  Quantidade: {stats['quantidade']} pedidos\n")
-                    f.write(f"  Tempo médio: {stats['tempo_medio']:.1f} min\n")
-                    f.write(f"  Valor total: R$ {stats['valor_total']:.2f}\n\n")
+            f.write("".join(partes))
         
         print(f"✓ Relatório completo salvo em: {arquivo_saida}")
         print(f"✓ Relatório em texto salvo em: {arquivo_txt}")
@@ -434,18 +631,18 @@ def executar_analise_completa():
     analisador = IFoodAdvancedAnalyzer(otimizador)
     
     print("\n1. Executando análises básicas...")
-    analisador.analise_distribuicao_tempos()
-    analisador.analise_utilizacao_entregadores()
-    analisador.analise_prioridades()
+    analisador.analise_distribuicao_tempos(verbose=True)
+    analisador.analise_utilizacao_entregadores(verbose=True)
+    analisador.analise_prioridades(verbose=True)
     
     print("\n2. Executando análise de sensibilidade...")
-    analisador.analise_sensibilidade_capacidade(range_capacidade=(1, 8))
+    analisador.analise_sensibilidade_capacidade(range_capacidade=(1, 8), verbose=True)
     
     print("\n3. Testando otimização com restrições...")
-    analisador.otimizacao_com_restricoes_tempo(tempo_max_expresso=25, tempo_max_prioritario=40)
+    analisador.otimizacao_com_restricoes_tempo(tempo_max_expresso=25, tempo_max_prioritario=40, verbose=True)
     
     print("\n4. Comparando cenários...")
-    analisador.comparar_cenarios()
+    analisador.comparar_cenarios(verbose=True)
     
     print("\n5. Gerando relatório completo...")
     analisador.gerar_relatorio_completo("analise_completa_ifood.json")
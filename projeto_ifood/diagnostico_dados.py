@@ -6,6 +6,22 @@ Script de diagnóstico para identificar problemas nos dados do iFood
 import pandas as pd
 import numpy as np
 import os
+import re
+
+# Limpeza de campos numéricos: vírgula decimal vira ponto (str.translate, em C)
+# e qualquer outro caractere não numérico é removido com uma única regex
+TRANS_COMMA_TO_DOT = str.maketrans({',': '.'})
+_CLEAN = re.compile(r'[^\d.]')
+
+def _clean_num(s: pd.Series) -> np.ndarray:
+    """
+    Converte uma coluna em valores numéricos (float32), com NaN onde não for possível
+    """
+    return pd.to_numeric(
+        s.astype(str).str.translate(TRANS_COMMA_TO_DOT).str.replace(_CLEAN, '', regex=True),
+        errors='coerce',
+        downcast='float'
+    ).to_numpy()
 
 def diagnosticar_arquivo(caminho_arquivo, nome_arquivo):
     """
@@ -94,16 +110,12 @@ def diagnosticar_dados_numericos(df, nome_dataset, colunas_criticas):
         
         # Tentar conversão numérica
         try:
-            # Converter para string primeiro
-            serie_str = serie.astype(str)
-            # Limpar caracteres não numéricos
-            serie_limpa = serie_str.str.replace(r'[^\d.,]', '', regex=True)
-            serie_limpa = serie_limpa.str.replace(',', '.')
-            # Tentar converter para numérico
-            serie_numerica = pd.to_numeric(serie_limpa, errors='coerce')
+            # Limpar caracteres não numéricos e converter em uma única passada
+            serie_numerica = _clean_num(serie)
+            invalidos = np.isnan(serie_numerica)
             
             nulos_original = serie.isnull().sum()
-            nulos_apos_conversao = serie_numerica.isnull().sum()
+            nulos_apos_conversao = invalidos.sum()
             perdas = nulos_apos_conversao - nulos_original
             
             print(f"    Nulos originais: {nulos_original}")
@@ -113,7 +125,7 @@ def diagnosticar_dados_numericos(df, nome_dataset, colunas_criticas):
                 
                 # Mostrar valores que causaram problemas
                 print(f"    Valores problemáticos:")
-                problematicos = serie[serie_numerica.isnull() & serie.notnull()]
+                problematicos = serie[invalidos & serie.notnull().to_numpy()]
                 for idx, valor in problematicos.head(5).items():
                     print(f"      Linha {idx}: '{valor}'")
             else:
@@ -121,7 +133,7 @@ def diagnosticar_dados_numericos(df, nome_dataset, colunas_criticas):
                 
             # Estatísticas dos valores válidos
             if nulos_apos_conversao < len(serie):
-                valores_validos = serie_numerica.dropna()
+                valores_validos = serie_numerica[~invalidos]
                 print(f"    Estatísticas dos valores válidos:")
                 print(f"      Min: {valores_validos.min():.2f}")
                 print(f"      Max: {valores_validos.max():.2f}")
@@ -188,11 +200,7 @@ def diagnostico_completo():
                 for col in colunas_criticas:
                     if col in df.columns:
                         # Simular limpeza
-                        serie_limpa = pd.to_numeric(
-                            df[col].astype(str).str.replace(r'[^\d.,]', '', regex=True).str.replace(',', '.'),
-                            errors='coerce'
-                        )
-                        nulos = serie_limpa.isnull().sum()
+                        nulos = np.isnan(_clean_num(df[col])).sum()
                         if nulos > 0:
                             registros_validos = min(registros_validos, len(df) - nulos)
                 
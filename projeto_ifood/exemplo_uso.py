@@ -60,8 +60,8 @@ def exemplo_rapido():
         "pedidos.csv"
     ):
         # Limitar dados para teste rápido
-        otimizador.entregadores = otimizador.entregadores.head(10)
-        otimizador.pedidos = otimizador.pedidos.head(20)
+        otimizador.entregadores = otimizador.entregadores.head(10).copy()
+        otimizador.pedidos = otimizador.pedidos.head(20).copy()
         
         otimizador.preprocessar_dados()
         otimizador.criar_modelo()
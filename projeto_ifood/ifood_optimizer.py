@@ -2,13 +2,237 @@ import pandas as pd
 import numpy as np
 from pulp import *
 import json
+import os
+import logging
+import atexit
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from geopy.geocoders import Nominatim 
 from geopy.extra.rate_limiter import RateLimiter
 from math import radians, sin, cos, sqrt, atan2 
 
+# orjson é opcional: sem ele os arquivos JSON são gravados com o módulo json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Diagnósticos detalhados vão para o logger (silencioso por padrão) ou para a tela com verbose=True
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# pgeocode é opcional: com ele os CEPs são geolocalizados a partir de uma base local
+try:
+    import pgeocode
+except ImportError:
+    pgeocode = None
+
+# SciPy é opcional: sem ele o modelo é sempre resolvido pelo solver de PL
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# pyarrow é opcional: sem ele o CSV de alocações é gravado pelo pandas
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+
+def _haversine_matrix(lats1, lons1, lats2, lons2):
+    """
+    Matriz de distâncias de Haversine (km) entre todos os pares de pontos
+    lats1/lons1 (linhas) e lats2/lons2 (colunas), em graus
+    """
+    R = 6371.0  # Raio da Terra em km
+    lat1 = np.radians(lats1)[:, None]
+    lon1 = np.radians(lons1)[:, None]
+    lat2 = np.radians(lats2)[None, :]
+    lon2 = np.radians(lons2)[None, :]
+
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+# Tipos das colunas dos CSVs, para a conversão ser feita pelo parser C do pandas
+DTYPES_ENTREGADORES = {
+    'ID': str,
+    'Capacidade Máxima': 'int32',
+    'Velocidade Média (km/h)': 'float64',
+    'Custo Operacional (R$/h)': 'float64',
+    'Endereço (CEP)': str,
+}
+DTYPES_PEDIDOS = {
+    'nome_restaurante': str,
+    'prioridade': 'int32',
+    'tempo_preparo_min': 'float64',
+    'tempo_deslocamento_min': 'float64',
+    'distancia_km': 'float64',
+}
+
+
+def _converter_valor(texto):
+    """
+    Converte o valor do pedido ("R$ 64,91" ou "64,91") para float durante a leitura do CSV
+    Valores inválidos viram NaN e são removidos no preprocessamento
+    """
+    try:
+        return float(texto.replace('R$', '').replace(' ', '').replace(',', '.'))
+    except ValueError:
+        return np.nan
+
+
+def gravar_csv(df, arquivo):
+    """
+    Grava um DataFrame em CSV (UTF-8, sem índice), com o escritor em C++ do pyarrow quando disponível
+    """
+    if pa is not None:
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), arquivo)
+    else:
+        df.to_csv(arquivo, index=False, encoding='utf-8')
+
+
+def _normalizar_cep(cep):
+    """
+    Chave do cache de coordenadas: CEP como texto, sem espaços nem hífen
+    """
+    return str(cep).strip().replace('-', '')
+
+
+# Caches de coordenadas por arquivo, compartilhados por todas as instâncias do otimizador;
+# os que receberam coordenadas novas são gravados uma única vez, ao final do processo
+_caches_cep = {}
+_caches_cep_alterados = set()
+
+
+def _cache_cep(arquivo):
+    """
+    Cache de coordenadas associado ao arquivo, carregado do disco no primeiro uso
+    """
+    if arquivo not in _caches_cep:
+        cache = {}
+        if os.path.exists(arquivo):
+            try:
+                with open(arquivo, 'r', encoding='utf-8') as f:
+                    cache = {cep: tuple(coords) for cep, coords in json.load(f).items()}
+            except (OSError, ValueError) as e:
+                print(f"Não foi possível ler o cache de CEPs ({arquivo}): {e}")
+        _caches_cep[arquivo] = cache
+    return _caches_cep[arquivo]
+
+
+def _salvar_cache_cep(arquivo):
+    """
+    Grava as coordenadas obtidas com sucesso, se o cache do arquivo tiver sido alterado
+    """
+    if arquivo not in _caches_cep_alterados:
+        return
+    sucessos = {cep: coords for cep, coords in _caches_cep[arquivo].items() if coords}
+    try:
+        with open(arquivo, 'w', encoding='utf-8') as f:
+            json.dump(sucessos, f, indent=2)
+    except OSError as e:
+        print(f"Não foi possível gravar o cache de CEPs ({arquivo}): {e}")
+        return
+    _caches_cep_alterados.discard(arquivo)
+
+
+@atexit.register
+def _salvar_caches_cep():
+    """
+    Grava, ao final do processo, todos os caches de CEPs com coordenadas novas
+    """
+    for arquivo in list(_caches_cep_alterados):
+        _salvar_cache_cep(arquivo)
+
+
+@functools.lru_cache(maxsize=None)
+def _geocoder_padrao():
+    """
+    Geocoder Nominatim com RateLimiter, criado uma única vez por processo
+    """
+    # O geolocator converte endereços em coordenadas
+    # O user_agent é importante para identificar sua aplicação
+    geolocator = Nominatim(user_agent="ifood_optimizer_jf")
+    # O RateLimiter evita sobrecarregar a API com muitas requisições
+    return RateLimiter(geolocator.geocode, min_delay_seconds=1)
+
+
+def _geocode_cep(cep_norm, geocode_fn):
+    """
+    Consulta as coordenadas de um CEP já normalizado com o geocoder informado
+    Retorna None em caso de falha (o cache fica a cargo de quem chama)
+    """
+    try:
+        # Adicionamos ", Juiz de Fora, Brazil" para dar mais contexto ao geocoder
+        query = f"{cep_norm}, Juiz de Fora, Brazil" 
+        
+        # Chama o geocoder diretamente com o CEP
+        location = geocode_fn(query)
+        
+        if location:
+            return (location.latitude, location.longitude)
+        print(f"Não foi possível obter coordenadas para o CEP: {cep_norm}")
+        return None
+
+    except Exception as e:
+        print(f"Ocorreu um erro ao buscar o CEP {cep_norm}: {e}")
+        return None
+
+
+def _ler_csv_tipado(arquivo, dtypes, converters=None):
+    """
+    Lê o CSV com os tipos e conversores informados (apenas as colunas presentes no arquivo)
+    Se algum valor não for compatível com o tipo, lê sem tipos e deixa a conversão para o preprocessamento
+    """
+    colunas = pd.read_csv(arquivo, nrows=0).columns
+    converters = {col: f for col, f in (converters or {}).items() if col in colunas}
+    try:
+        return pd.read_csv(arquivo, decimal=',', converters=converters,
+                           dtype={col: tipo for col, tipo in dtypes.items() if col in colunas})
+    except (ValueError, TypeError):
+        return pd.read_csv(arquivo, decimal=',', converters=converters)
+
+
+def solver_padrao(msg=1, timeLimit=300):
+    """
+    Solver padrão: HiGHS em processo (highspy), HiGHS pela linha de comando
+    ou, se nenhum estiver instalado, GLPK
+    """
+    for classe in (HiGHS, HiGHS_CMD):
+        solver = classe(msg=msg, timeLimit=timeLimit)
+        if solver.available():
+            return solver
+    return GLPK_CMD(msg=msg, timeLimit=timeLimit)
+
+
+def _json_default(obj):
+    """
+    Conversão de objetos não serializáveis: datas pelo isoformat(), o resto via str()
+    """
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+
+def serializar_json(valor):
+    """
+    Serializa um valor em JSON (bytes UTF-8), com orjson quando disponível
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            valor,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            default=_json_default
+        )
+    return json.dumps(valor, indent=2, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
 class IFoodDeliveryOptimizer:
-    def __init__(self):
+    def __init__(self, arquivo_cache_cep="cep_cache.json", verbose=False):
         """
         Classe para otimização de alocação de entregadores do iFood
         Baseada no modelo matemático fornecido
@@ -16,17 +240,24 @@ class IFoodDeliveryOptimizer:
         self.restaurantes = None
         self.entregadores = None
         self.pedidos = None
+        self.verbose = verbose
         self.modelo = None
         self.resultado = None
+        self.tempos_desloc_mat = None
+        self._tempos_er = None
+        self.custo_pares = None
 
         # Inicializa o geolocator e o cache de CEPs
-        # O geolocator converte endereços em coordenadas
-        # O user_agent é importante para identificar sua aplicação
-        self.geolocator = Nominatim(user_agent="ifood_optimizer_jf")
-        # O RateLimiter evita sobrecarregar a API com muitas requisições
-        self.geocode = RateLimiter(self.geolocator.geocode, min_delay_seconds=1)
+        # Geolocator e RateLimiter são únicos no processo: o limite de requisições vale para
+        # todas as instâncias
+        self.geocode = _geocoder_padrao()
+        # Geocodificador offline (pgeocode), criado apenas quando necessário
+        self._geocoder_offline = None
         # Cache para guardar coordenadas de CEPs já consultados
-        self.cep_cache = {} 
+        # Persistido em disco entre execuções (apenas as consultas bem-sucedidas)
+        # O dicionário é o mesmo para todas as instâncias que usam o mesmo arquivo
+        self.arquivo_cache_cep = os.path.abspath(arquivo_cache_cep) if arquivo_cache_cep else None
+        self.cep_cache = _cache_cep(self.arquivo_cache_cep) if self.arquivo_cache_cep else {}
         
     def carregar_dados(self, arquivo_restaurantes, arquivo_entregadores, arquivo_pedidos):
         """
@@ -48,7 +279,7 @@ class IFoodDeliveryOptimizer:
                 self.entregadores = pd.read_excel(arquivo_entregadores)
             else:
                 # CORREÇÃO: usar decimal=',' para formato brasileiro
-                self.entregadores = pd.read_csv(arquivo_entregadores, decimal=',')
+                self.entregadores = _ler_csv_tipado(arquivo_entregadores, DTYPES_ENTREGADORES)
             
             print(f"✓ Entregadores carregados: {len(self.entregadores)} registros")
         except Exception as e:
@@ -61,14 +292,21 @@ class IFoodDeliveryOptimizer:
                 self.pedidos = pd.read_excel(arquivo_pedidos)
             else:
                 # CORREÇÃO: usar decimal=',' para formato brasileiro
-                self.pedidos = pd.read_csv(arquivo_pedidos, decimal=',')
+                # O valor_pedido (que pode vir com "R$") é convertido durante a leitura
+                self.pedidos = _ler_csv_tipado(arquivo_pedidos, DTYPES_PEDIDOS,
+                                               converters={'valor_pedido': _converter_valor})
                 
-            # Limpeza adicional do valor_pedido se necessário
+            # Limpeza adicional do valor_pedido se necessário (planilhas Excel)
             if 'valor_pedido' in self.pedidos.columns:
                 # Se ainda tem R$ no valor, remover
                 if self.pedidos['valor_pedido'].dtype == 'object':
-                    self.pedidos['valor_pedido'] = self.pedidos['valor_pedido'].astype(str).str.replace('R$', '').str.replace(' ', '')
-                    self.pedidos['valor_pedido'] = pd.to_numeric(self.pedidos['valor_pedido'], errors='coerce')
+                    # "R$" e espaços saem numa única passada de regex; vírgula decimal vira ponto
+                    self.pedidos['valor_pedido'] = pd.to_numeric(
+                        self.pedidos['valor_pedido'].astype(str)
+                        .str.replace(r'[R$\s]', '', regex=True)
+                        .str.replace(',', '.', regex=False),
+                        errors='coerce'
+                    )
                     
             print(f"✓ Pedidos carregados: {len(self.pedidos)} registros")
         except Exception as e:
@@ -77,33 +315,51 @@ class IFoodDeliveryOptimizer:
             
         return True
     
+    def _depurando(self):
+        """
+        Indica se os diagnósticos detalhados serão exibidos (verbose ou logger em DEBUG)
+        """
+        return self.verbose or logger.isEnabledFor(logging.DEBUG)
+    
+    def _debug(self, texto):
+        """
+        Mostra um diagnóstico na tela (verbose) ou envia ao logger em nível DEBUG
+        """
+        if self.verbose:
+            print(texto)
+        else:
+            logger.debug(texto)
+    
     def preprocessar_dados(self):
         """
         Preprocessa os dados para o modelo de otimização
+        Os diagnósticos que percorrem as colunas só são calculados com verbose=True ou logger em DEBUG
         """
         print("Preprocessando dados...")
         
-        # Debug: verificar dados antes da limpeza
-        print(f"Debug - Antes da limpeza:")
-        print(f"  Entregadores: {len(self.entregadores)}")
-        print(f"  Pedidos: {len(self.pedidos)}")
-        
-        # Verificar colunas existentes
-        print(f"  Colunas entregadores: {list(self.entregadores.columns)}")
-        print(f"  Colunas pedidos: {list(self.pedidos.columns)}")
-        
-        # Verificar se os dados foram carregados corretamente
-        print(f"  Verificação de tipos de dados:")
         colunas_numericas_pedidos = ['tempo_deslocamento_min', 'distancia_km', 'valor_pedido', 'tempo_preparo_min']
-        for col in colunas_numericas_pedidos:
-            if col in self.pedidos.columns:
-                dtype = self.pedidos[col].dtype
-                null_count = self.pedidos[col].isnull().sum()
-                print(f"    {col}: {dtype}, {null_count} nulos")
-                
-                # Mostrar alguns valores de exemplo
-                valores_exemplo = self.pedidos[col].dropna().head(3).tolist()
-                print(f"      Exemplos: {valores_exemplo}")
+        
+        if self._depurando():
+            # Debug: verificar dados antes da limpeza
+            self._debug(f"Debug - Antes da limpeza:")
+            self._debug(f"  Entregadores: {len(self.entregadores)}")
+            self._debug(f"  Pedidos: {len(self.pedidos)}")
+            
+            # Verificar colunas existentes
+            self._debug(f"  Colunas entregadores: {list(self.entregadores.columns)}")
+            self._debug(f"  Colunas pedidos: {list(self.pedidos.columns)}")
+            
+            # Verificar se os dados foram carregados corretamente
+            self._debug(f"  Verificação de tipos de dados:")
+            for col in colunas_numericas_pedidos:
+                if col in self.pedidos.columns:
+                    dtype = self.pedidos[col].dtype
+                    null_count = self.pedidos[col].isnull().sum()
+                    self._debug(f"    {col}: {dtype}, {null_count} nulos")
+                    
+                    # Mostrar alguns valores de exemplo
+                    valores_exemplo = self.pedidos[col].dropna().head(3).tolist()
+                    self._debug(f"      Exemplos: {valores_exemplo}")
         
         # Limpeza dos entregadores
         print("Limpando dados dos entregadores...")
@@ -120,7 +376,7 @@ class IFoodDeliveryOptimizer:
         # Remover entregadores com dados inválidos
         colunas_essenciais_ent = [col for col in colunas_numericas_entregadores if col in self.entregadores.columns]
         if colunas_essenciais_ent:
-            self.entregadores = self.entregadores.dropna(subset=colunas_essenciais_ent)
+            self.entregadores = self.entregadores.dropna(subset=colunas_essenciais_ent).copy()
         
         print(f"  Entregadores removidos: {entregadores_antes - len(self.entregadores)}")
         
@@ -139,15 +395,16 @@ class IFoodDeliveryOptimizer:
         colunas_essenciais_ped = [col for col in colunas_numericas_pedidos if col in self.pedidos.columns]
         if colunas_essenciais_ped:
             print(f"  Limpando baseado nas colunas: {colunas_essenciais_ped}")
-            self.pedidos = self.pedidos.dropna(subset=colunas_essenciais_ped)
+            self.pedidos = self.pedidos.dropna(subset=colunas_essenciais_ped).copy()
         
         print(f"  Pedidos removidos: {pedidos_antes - len(self.pedidos)}")
         
         # Verificação final dos dados
-        print(f"\nVerificação final dos dados:")
-        for col in colunas_numericas_pedidos:
-            if col in self.pedidos.columns:
-                print(f"  {col}: {len(self.pedidos[col].dropna())}/{len(self.pedidos)} válidos")
+        if self._depurando():
+            self._debug(f"\nVerificação final dos dados:")
+            for col in colunas_numericas_pedidos:
+                if col in self.pedidos.columns:
+                    self._debug(f"  {col}: {self.pedidos[col].count()}/{len(self.pedidos)} válidos")
         
         # Se ainda temos 0 pedidos, usar dados de exemplo para não quebrar
         if len(self.pedidos) == 0:
@@ -185,8 +442,25 @@ class IFoodDeliveryOptimizer:
             print("❌ ERRO: Nenhum entregador válido após preprocessamento!")
             return False
         
-        # Atallho para fazer pesquisa do CEP do restaurante. Menos custoso.
-        self.mapa_restaurante_cep = self.restaurantes.set_index('Restaurante')['CEP'].to_dict()
+        # Atalho para o CEP do restaurante de cada pedido: índice inteiro do restaurante
+        # (-1 se o restaurante não estiver cadastrado) e array de CEPs por restaurante
+        restaurante_to_idx = {nome: k for k, nome in enumerate(self.restaurantes['Restaurante'])}
+        self.pedidos['restaurante_idx'] = (
+            self.pedidos['nome_restaurante'].map(restaurante_to_idx).fillna(-1).astype('int32')
+        )
+        self.restaurante_ceps = self.restaurantes['CEP'].to_numpy()
+        
+        # Colunas numéricas como arrays contíguos (SoA) para os cálculos matriciais
+        self.velocidades = self.entregadores['Velocidade Média (km/h)'].to_numpy(dtype=np.float64)
+        self.distancias = self.pedidos['distancia_km'].to_numpy(dtype=np.float64)
+        self.tempos_preparo = self.pedidos['tempo_preparo_min'].to_numpy(dtype=np.float64)
+        self.tempos_desloc_cliente = self.pedidos['tempo_deslocamento_min'].to_numpy(dtype=np.float64)
+        
+        # Tempos de deslocamento de todos os pares, num único broadcast
+        self.tempos_desloc_mat = (self.distancias[None, :] / self.velocidades[:, None]) * 60.0
+        
+        # A matriz via geolocalização depende dos dados; será recalculada no próximo uso
+        self._tempos_er = None
         
         return True
         
@@ -195,43 +469,135 @@ class IFoodDeliveryOptimizer:
         Calcula o tempo de deslocamento do entregador até o restaurante
         Simplificação: usando tempo médio baseado na velocidade do entregador
         """
-        velocidade = self.entregadores.iloc[entregador_idx]['Velocidade Média (km/h)']
-        distancia_estimada = self.pedidos.iloc[pedido_idx]['distancia_km']
-        
-        # Tempo em minutos
-        tempo_deslocamento = (distancia_estimada / velocidade) * 60
-        return tempo_deslocamento
+        return self.tempos_desloc_mat[entregador_idx, pedido_idx]
     
+    def salvar_cache_cep(self):
+        """
+        Grava em disco as coordenadas obtidas com sucesso (falhas são consultadas de novo na próxima execução)
+        """
+        if self.arquivo_cache_cep:
+            _salvar_cache_cep(self.arquivo_cache_cep)
+
+    def _marcar_cache_alterado(self):
+        """
+        Indica que o cache de CEPs tem coordenadas novas a gravar
+        """
+        if self.arquivo_cache_cep:
+            _caches_cep_alterados.add(self.arquivo_cache_cep)
+
+    def pre_resolver_ceps(self, max_workers=4):
+        """
+        Consulta de uma vez todos os CEPs distintos (entregadores e restaurantes) ainda fora do cache
+        As consultas rodam em threads: o RateLimiter é compartilhado e mantém o limite de
+        1 requisição/s no total, mas a latência de rede de uma consulta se sobrepõe à espera das outras
+        """
+        ceps = pd.concat([self.entregadores['Endereço (CEP)'], self.restaurantes['CEP']]).dropna()
+        pendentes = {_normalizar_cep(cep) for cep in ceps} - self.cep_cache.keys()
+        # Primeiro a base local (sem rede nem espera); o Nominatim fica para os CEPs que faltarem
+        pendentes -= self._geocodificar_offline(pendentes)
+        if pendentes:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(self.obter_coordenadas_por_cep, pendentes))
+        self.salvar_cache_cep()
+
+    def _geocodificar_offline(self, ceps):
+        """
+        Geolocaliza CEPs com a base local do pgeocode (GeoNames, códigos no formato NNNNN-NNN)
+        Cada CEP é procurado pelo código completo e, se não estiver na base, pelo código
+        genérico do setor (NNNNN-000)
+        Retorna o conjunto de CEPs resolvidos; vazio se o pgeocode não estiver disponível
+        """
+        # Só CEPs de 8 dígitos (os que vêm como número perdem o zero à esquerda)
+        ceps = sorted(cep for cep in ceps if cep.isdigit() and len(cep) <= 8)
+        if pgeocode is None or not ceps:
+            return set()
+        try:
+            if self._geocoder_offline is None:
+                # Na primeira vez o pgeocode baixa a base do Brasil e a guarda localmente
+                self._geocoder_offline = pgeocode.Nominatim('br')
+            completos = [cep.zfill(8) for cep in ceps]
+            consulta = self._geocoder_offline.query_postal_code([f"{c[:5]}-{c[5:]}" for c in completos])
+            lats = np.array(consulta['latitude'], dtype=np.float64)
+            lons = np.array(consulta['longitude'], dtype=np.float64)
+            
+            faltantes = np.flatnonzero(np.isnan(lats) | np.isnan(lons))
+            if len(faltantes):
+                setores = self._geocoder_offline.query_postal_code(
+                    [f"{completos[k][:5]}-000" for k in faltantes]
+                )
+                lats[faltantes] = setores['latitude'].to_numpy(dtype=np.float64)
+                lons[faltantes] = setores['longitude'].to_numpy(dtype=np.float64)
+        except Exception as e:
+            print(f"Geolocalização offline indisponível: {e}")
+            return set()
+        
+        resolvidos = set()
+        for cep, lat, lon in zip(ceps, lats, lons):
+            if not (np.isnan(lat) or np.isnan(lon)):
+                self.cep_cache[cep] = (float(lat), float(lon))
+                resolvidos.add(cep)
+        if resolvidos:
+            self._marcar_cache_alterado()
+        return resolvidos
+
     def obter_coordenadas_por_cep(self, cep):
         """
         Busca as coordenadas de um CEP diretamente.
         Utiliza um cache para evitar requisições repetidas.
         """
-        cep = str(cep).strip().replace('-', '')
+        cep = _normalizar_cep(cep)
         if cep in self.cep_cache:
             return self.cep_cache[cep]
 
-        try:
-            # Adicionamos ", Juiz de Fora, Brazil" para dar mais contexto ao geocoder
-            query = f"{cep}, Juiz de Fora, Brazil" 
-            
-            # Chama o geocoder diretamente com o CEP
-            location = self.geocode(query)
-            
-            if location:
-                coords = (location.latitude, location.longitude)
-                self.cep_cache[cep] = coords # Armazena sucesso no cache
-                return coords
-            else:
-                print(f"Não foi possível obter coordenadas para o CEP: {cep}")
-                self.cep_cache[cep] = None # Armazena falha no cache
-                return None
+        # Só os sucessos vão para o cache: uma falha (ex.: timeout) é consultada de novo na próxima vez
+        coords = _geocode_cep(cep, self.geocode)
+        if coords:
+            self.cep_cache[cep] = coords
+            self._marcar_cache_alterado()
+        return coords
 
-        except Exception as e:
-            print(f"Ocorreu um erro ao buscar o CEP {cep}: {e}")
-            self.cep_cache[cep] = None
-            return None
+    def _coordenadas_ceps(self, ceps):
+        """
+        Arrays (lat, lon) para uma sequência de CEPs, a partir do cache (preenchido por pre_resolver_ceps).
+        CEPs sem coordenadas ficam com NaN.
+        """
+        coords_unicas = {}
+        for cep in pd.unique(ceps):
+            if not pd.isna(cep):
+                coords_unicas[cep] = self.cep_cache.get(_normalizar_cep(cep))
 
+        lats = np.full(len(ceps), np.nan)
+        lons = np.full(len(ceps), np.nan)
+        for k, cep in enumerate(ceps):
+            coords = coords_unicas.get(cep)
+            if coords:
+                lats[k], lons[k] = coords
+        return lats, lons
+
+    def matriz_tempos_entregador_restaurante(self):
+        """
+        Matriz (entregadores x pedidos) com o tempo (min) de cada entregador até o restaurante do pedido.
+        Depende da geolocalização dos CEPs (internet); calculada uma única vez.
+        Pares sem coordenadas ou com velocidade zero recebem 9999 para penalizar a alocação.
+        """
+        if self._tempos_er is None:
+            self.pre_resolver_ceps()
+            lats_ent, lons_ent = self._coordenadas_ceps(
+                self.entregadores['Endereço (CEP)'].to_numpy()
+            )
+            # Coordenadas por restaurante, com um NaN no final para os pedidos com índice -1
+            lats_r, lons_r = self._coordenadas_ceps(self.restaurante_ceps)
+            idx_rest = self.pedidos['restaurante_idx'].to_numpy()
+            lats_rest = np.append(lats_r, np.nan)[idx_rest]
+            lons_rest = np.append(lons_r, np.nan)[idx_rest]
+            distancias = _haversine_matrix(lats_ent, lons_ent, lats_rest, lons_rest)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                tempos_er = distancias / self.velocidades[:, None] * 60
+            invalidos = np.isnan(distancias) | (self.velocidades == 0)[:, None]
+            tempos_er[invalidos] = 9999
+            self._tempos_er = tempos_er
+        return self._tempos_er
 
     def calcular_tempo_entregador_restaurante(self, entregador_idx, pedido_idx):
         """
@@ -239,30 +605,7 @@ class IFoodDeliveryOptimizer:
         de um entregador até o restaurante de um pedido.
         Retorna um valor alto em caso de falha para penalizar a alocação.
         """
-        # Obter dados do entregador
-        entregador = self.entregadores.iloc[entregador_idx]
-        cep_entregador = entregador['Endereço (CEP)']
-        velocidade_kmh = entregador['Velocidade Média (km/h)']
-        
-        # Obter dados do restaurante do pedido
-        nome_restaurante = self.pedidos.iloc[pedido_idx]['nome_restaurante']
-        cep_restaurante = self.mapa_restaurante_cep.get(nome_restaurante)
-
-        # Obter coordenadas
-        coords_entregador = self.obter_coordenadas_por_cep(cep_entregador)
-        coords_restaurante = self.obter_coordenadas_por_cep(cep_restaurante)
-
-        if not coords_entregador or not coords_restaurante:
-            return 9999  # Penalidade alta se não encontrar coordenadas
-
-        # Calcular distância e tempo
-        distancia_km = self.calcular_distancia_coordenadas(coords_entregador, coords_restaurante)
-        
-        if velocidade_kmh == 0:
-            return 9999 # Evitar divisão por zero
-
-        tempo_em_minutos = (distancia_km / velocidade_kmh) * 60
-        return tempo_em_minutos
+        return self.matriz_tempos_entregador_restaurante()[entregador_idx, pedido_idx]
 
 
     def calcular_distancia_coordenadas(self, coords1, coords2):
@@ -300,94 +643,133 @@ class IFoodDeliveryOptimizer:
         I = range(len(self.entregadores))  # Entregadores
         J = range(len(self.pedidos))       # Pedidos
         
+        # Colunas extraídas uma única vez como arrays (indexação direta, sem .iloc por célula)
+        tp = self.tempos_preparo
+        td = self.tempos_desloc_cliente
+        pri = self.pedidos['prioridade'].to_numpy()
+        cap = self.entregadores['Capacidade Máxima'].to_numpy()
+        
+        # R2: Cálculo do tempo de entrega de cada par (i,j): deslocamento + preparo + entrega ao cliente
+        # O T_j da formulação fica totalmente determinado por x, então não precisa
+        # de variável própria: é substituído na função objetivo e calculado após a resolução
+        self.tempos_pares = self.tempos_desloc_mat + tp[None, :] + td[None, :]
+        
+        # Custo de cada par na função objetivo (tempo ponderado pela prioridade);
+        # a matriz da construção anterior é reaproveitada se o tamanho for o mesmo
+        out = self.custo_pares
+        if out is not None and out.shape != self.tempos_pares.shape:
+            out = None
+        custo = np.multiply(pri[None, :], self.tempos_pares, out=out)
+        
+        # Tempos de deslocamento Entregador -> Restaurante via geolocalização
+        # Usar apenas se tiver internet (substitui as matrizes de tempo e custo acima)
+        # print("Pré-calculando tempos de deslocamento Entregador -> Restaurante ...")
+        # tempos_er = self.matriz_tempos_entregador_restaurante() # Matriz com os tempos t_ij^ER
+        # TempoTotal = Tempo_Calculado + Tempo_Preparo + Tempo_Entrega_Final
+        # self.tempos_pares = tempos_er + tp[None, :] + td[None, :]
+        # custo = pri[None, :] * self.tempos_pares
+        
+        self.custo_pares = custo
+        
         # Criar o modelo
         self.modelo = LpProblem("IFood_Delivery_Optimization", LpMinimize)
         
         # Variáveis de decisão principais
         # xij = 1 se entregador i é designado para pedido j
-        x = {}
-        for i in I:
-            for j in J:
-                x[i,j] = LpVariable(f"x_{i}_{j}", cat='Binary')
-        
-        # Variáveis auxiliares
-        # Tj = tempo total de entrega do pedido j
-        T = {}
-        for j in J:
-            T[j] = LpVariable(f"T_{j}", lowBound=0)
-        
-        # Função Objetivo: Minimizar soma dos tempos de entrega
-        self.modelo += lpSum([T[j] for j in J]), "Tempo_Total_Entrega"
+        # LpVariable.matrix cria a matriz x[i][j] (nomes x_i_j) de uma vez
+        x = LpVariable.matrix("x", (list(I), list(J)), cat='Binary')
+        
+        # Função Objetivo: Minimizar soma dos tempos de entrega ponderados pela prioridade
+        # (R4: pedidos prioritários recebem peso maior no tempo)
+        # Z = Σ_j p_j * T_j = Σ_ij p_j * tempo_ij * x_ij
+        # LpAffineExpression recebe pares (variável, coeficiente) diretamente,
+        # o que é bem mais rápido que lpSum sobre produtos
+        self.modelo += LpAffineExpression(
+            ((x[i][j], custo[i,j]) for i in I for j in J)
+        ), "Tempo_Total_Ponderado"
         
         # Restrições
         
         # R1: Atribuição única de pedidos
         for j in J:
-            self.modelo += lpSum([x[i,j] for i in I]) == 1, f"Atribuicao_Unica_Pedido_{j}"
-        
-        # R2: Cálculo do tempo de entrega
-        for j in J:
-            tempo_preparo = self.pedidos.iloc[j]['tempo_preparo_min']
-            tempo_deslocamento_cliente = self.pedidos.iloc[j]['tempo_deslocamento_min']
-            
-            tempo_total_expr = lpSum([
-                x[i,j] * (self.calcular_tempo_deslocamento(i, j) + tempo_preparo + tempo_deslocamento_cliente)
-                for i in I
-            ])
-            
-            self.modelo += T[j] == tempo_total_expr, f"Calculo_Tempo_Pedido_{j}"
-
-
-        # R2: Cálculo do tempo de entrega    
-        # Rodar essa restrição apenas se tiver internet
-        # print("Pré-calculando tempos de deslocamento Entregador -> Restaurante ...")
-        # tempos_er = {} # Dicionário para armazenar os tempos t_ij^ER
-        # for i in I:
-        #     for j in J:
-        #         tempos_er[i, j] = self.calcular_tempo_entregador_restaurante(i, j)
-
-        # for j in J:
-        #     # Obter tempos fixos do pedido
-        #     tempo_preparo = self.pedidos.iloc[j]['tempo_preparo_min']
-        #     tempo_deslocamento_cliente = self.pedidos.iloc[j]['tempo_deslocamento_min']
-        #     
-        #     # TempoTotal = Soma(x_ij * (Tempo_Calculado + Tempo_Preparo + Tempo_Entrega_Final))
-        #     tempo_total_expr = lpSum([
-        #         x[i, j] * (tempos_er[i, j] + tempo_preparo + tempo_deslocamento_cliente)
-        #         for i in I
-        #     ])
-        #     
-        #     self.modelo += T[j] == tempo_total_expr, f"Calculo_Tempo_Pedido_{j}"
-
+            self.modelo += LpAffineExpression(((x[i][j], 1) for i in I)) == 1, f"Atribuicao_Unica_Pedido_{j}"
         
         # R3: Capacidade máxima dos entregadores
         # Se inserirmos a disponibilidade aqui, o modelo fica inviável
+        self._cap_constrs = []
         for i in I:
-            capacidade_max = self.entregadores.iloc[i]['Capacidade Máxima']
-            self.modelo += lpSum([x[i,j] for j in J]) <= capacidade_max, f"Capacidade_Entregador_{i}"
+            capacidade_max = cap[i]
+            restricao_cap = LpAffineExpression(((x[i][j], 1) for j in J)) <= capacidade_max
+            self.modelo += restricao_cap, f"Capacidade_Entregador_{i}"
+            self._cap_constrs.append(restricao_cap)
+        self.capacidades_atuais = cap.copy()
 
-        # R4: Prioridade dos pedidos (peso na função objetivo)
-        # Pedidos prioritários recebem peso maior no tempo
-        objetivo_ponderado = lpSum([
-            T[j] * self.pedidos.iloc[j]['prioridade'] for j in J
-        ])
-        
-        # Substituir função objetivo para considerar prioridades
-        self.modelo.objective = objetivo_ponderado
-        
         self.x_vars = x
-        self.t_vars = T
         
         print(f"Modelo criado com {len(I)} entregadores e {len(J)} pedidos")
+    
+    def criar_modelo_parametrizado(self):
+        """
+        Retorna as restrições de capacidade do modelo, criando-o se necessário.
+        Permite alterar o lado direito (changeRHS) e resolver novamente
+        sem reconstruir variáveis e restrições.
+        """
+        if self.modelo is None:
+            self.criar_modelo()
+        return self._cap_constrs
+    
+    def set_capacity(self, capacidades):
+        """
+        Altera a capacidade dos entregadores no modelo já criado, sem reconstruí-lo
+        Aceita um valor único ou um vetor com uma capacidade por entregador
+        """
+        cap_constrs = self.criar_modelo_parametrizado()
+        capacidades = np.broadcast_to(np.asarray(capacidades), (len(cap_constrs),))
+        for restricao, cap in zip(cap_constrs, capacidades):
+            restricao.changeRHS(cap)
+        self.capacidades_atuais = capacidades.copy()
         
-    def resolver_modelo(self):
+    def _resolver_por_atribuicao(self):
         """
-        Resolve o modelo usando GLPK
+        Resolve o modelo como problema de atribuição (algoritmo húngaro do SciPy).
+        Cada entregador é expandido em cap_i "vagas" e cada pedido vai para uma vaga;
+        a relaxação linear da atribuição bipartida já é inteira, então a solução é ótima.
+        Retorna False quando não se aplica (SciPy ausente ou capacidade total insuficiente).
+        """
+        capacidades = np.clip(np.asarray(self.capacidades_atuais, dtype=np.int64), 0, None)
+        if linear_sum_assignment is None or capacidades.sum() < len(self.pedidos):
+            return False
+        
+        # Nenhum entregador recebe mais vagas que o total de pedidos (capacidades muito grandes
+        # inflariam a matriz sem mudar a solução)
+        vagas = np.repeat(np.arange(len(capacidades)), np.minimum(capacidades, len(self.pedidos)))
+        linhas, colunas = linear_sum_assignment(self.custo_pares[vagas])
+        
+        # Grava a solução nas variáveis do PuLP para que extrair_resultado funcione igual
+        for linha in self.x_vars:
+            for var in linha:
+                var.varValue = 0
+        for i, j in zip(vagas[linhas].tolist(), colunas.tolist()):
+            self.x_vars[i][j].varValue = 1
+        self.modelo.status = LpStatusOptimal
+        return True
+    
+    def resolver_modelo(self, solver=None):
+        """
+        Resolve o modelo usando HiGHS (ou GLPK, se o HiGHS não estiver instalado)
+        Um solver já configurado pode ser passado para ser reutilizado entre resoluções
+        Sem solver informado, tenta antes resolver como problema de atribuição (SciPy)
         """
         print("Resolvendo modelo de otimização...")
         
-        # Configurar solver (GLPK)
-        solver = GLPK_CMD(msg=1, timeLimit=300)  # 5 minutos de limite
+        if solver is None and self._resolver_por_atribuicao():
+            print("✓ Solução ótima encontrada! (problema de atribuição)")
+            self.extrair_resultado()
+            return True
+        
+        # Configurar solver (HiGHS, com GLPK como alternativa)
+        if solver is None:
+            solver = solver_padrao(msg=1, timeLimit=300)  # 5 minutos de limite
         
         # Resolver
         status = self.modelo.solve(solver)
@@ -419,27 +801,34 @@ class IFoodDeliveryOptimizer:
             return
         
         # Alocações
-        alocacoes = []
-        for i in range(len(self.entregadores)):
-            for j in range(len(self.pedidos)):
-                if (i,j) in self.x_vars and self.x_vars[i,j].value() == 1:
-                    tempo_entrega = self.t_vars[j].value() if j in self.t_vars else 0
-                    
-                    alocacoes.append({
-                        'entregador_id': self.entregadores.iloc[i]['ID'],
-                        'entregador_idx': i,
-                        'pedido_id': self.pedidos.iloc[j]['pedido_id'],
-                        'pedido_idx': j,
-                        'restaurante': self.pedidos.iloc[j]['nome_restaurante'],
-                        'prioridade': self.pedidos.iloc[j]['prioridade'],
-                        'valor_pedido': self.pedidos.iloc[j]['valor_pedido'],
-                        'tempo_entrega': tempo_entrega
-                    })
+        # Os pares selecionados são guardados como índices e as colunas montadas
+        # de uma vez (estrutura colunar), sem dicionários por alocação
+        # Matriz de valores da solução montada de uma vez; os pares escolhidos saem do argwhere
+        sol = np.array([[var.varValue or 0 for var in linha] for linha in self.x_vars],
+                       dtype=np.float64).reshape(len(self.entregadores), len(self.pedidos))
+        pares = np.argwhere(sol > 0.5).astype(np.int32)
+        idx_entregadores = pares[:, 0]
+        idx_pedidos = pares[:, 1]
+        
+        # T_j calculado a partir da alocação escolhida
+        tempos_entrega = self.tempos_pares[idx_entregadores, idx_pedidos]
+        
+        alocacoes_df = pd.DataFrame({
+            'entregador_id': self.entregadores['ID'].to_numpy()[idx_entregadores],
+            'entregador_idx': idx_entregadores,
+            'pedido_id': self.pedidos['pedido_id'].to_numpy()[idx_pedidos],
+            'pedido_idx': idx_pedidos,
+            'restaurante': self.pedidos['nome_restaurante'].to_numpy()[idx_pedidos],
+            'prioridade': self.pedidos['prioridade'].to_numpy()[idx_pedidos],
+            'valor_pedido': self.pedidos['valor_pedido'].to_numpy()[idx_pedidos],
+            'tempo_entrega': tempos_entrega
+        })
+        
+        # Lista de dicionários mantida para compatibilidade (relatórios e exportação JSON)
+        alocacoes = alocacoes_df.to_dict(orient='records')
         
         # Calcular estatísticas
-        tempos_validos = [self.t_vars[j].value() for j in range(len(self.pedidos)) if j in self.t_vars and self.t_vars[j].value() is not None]
-        
-        tempo_total = sum(tempos_validos) if tempos_validos else 0
+        tempo_total = float(tempos_entrega.sum())
         tempo_medio = tempo_total / len(self.pedidos) if len(self.pedidos) > 0 else 0
         
         self.resultado = {
@@ -447,7 +836,8 @@ class IFoodDeliveryOptimizer:
             'tempo_total': tempo_total,
             'tempo_medio': tempo_medio,
             'alocacoes': alocacoes,
-            'num_entregadores_usados': len(set([a['entregador_idx'] for a in alocacoes])) if alocacoes else 0,
+            'alocacoes_df': alocacoes_df,
+            'num_entregadores_usados': alocacoes_df['entregador_idx'].nunique(),
             'num_pedidos_alocados': len(alocacoes),
             'num_pedidos_total': len(self.pedidos)
         }
@@ -479,15 +869,17 @@ class IFoodDeliveryOptimizer:
                 'num_restaurantes': len(self.restaurantes)
             }
             
-            with open(arquivo_saida, 'w', encoding='utf-8') as f:
-                json.dump(self.resultado, f, indent=2, ensure_ascii=False, default=str)
+            # O DataFrame colunar não vai para o JSON; as alocações já estão em 'alocacoes'
+            resultado_json = {k: v for k, v in self.resultado.items() if k != 'alocacoes_df'}
+            with open(arquivo_saida, 'wb') as f:
+                f.write(serializar_json(resultado_json))
             
             print(f"✓ Resultados exportados para: {arquivo_saida}")
             
             # Também criar CSV das alocações
-            df_alocacoes = pd.DataFrame(self.resultado['alocacoes'])
+            df_alocacoes = self.resultado['alocacoes_df']
             arquivo_csv = arquivo_saida.replace('.json', '_alocacoes.csv')
-            df_alocacoes.to_csv(arquivo_csv, index=False, encoding='utf-8')
+            gravar_csv(df_alocacoes, arquivo_csv)
             print(f"✓ Alocações exportadas para: {arquivo_csv}")
             
             return True
@@ -2,9 +2,211 @@
 Script de configuração para o projeto de otimização do iFood
 """
 
+import asyncio
 import subprocess
 import sys
 import os
+import json
+import re
+import shutil
+import filecmp
+import tempfile
+import functools
+from importlib.metadata import version, PackageNotFoundError
+
+# Com close_fds=False (e caminho absoluto do executável, sem cwd/preexec_fn) o subprocess usa
+# os.posix_spawn em vez de fork+exec. É seguro porque os descritores do Python já nascem
+# não herdáveis (PEP 446)
+_ARGS_SPAWN = {"close_fds": False}
+
+DEPENDENCIAS = (
+    "pandas>=1.5.0",
+    "numpy>=1.21.0",
+    "pulp>=2.7.0",
+    "openpyxl>=3.0.0",
+    "xlrd>=2.0.0",
+    "geopy>=2.2.0",
+)
+
+# Wheels baixadas uma vez e reaproveitadas pelas próximas execuções do setup (ex.: CI)
+PASTA_WHEELHOUSE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".wheelhouse")
+
+ARQUIVOS_NECESSARIOS = (
+    "restaurantes.csv",
+    "entregadores.csv",
+    "pedidos.csv",
+)
+
+def _comando_instalacao(uv=None):
+    """
+    Início do comando de instalação silenciosa: "uv pip install" se o uv foi encontrado, senão pip
+    O uv instala no ambiente do interpretador atual (--python), não no Python do sistema
+    """
+    if uv is not None:
+        return [uv, "pip", "install", "-q", "--python", sys.executable]
+    return [sys.executable, "-m", "pip", "install", "-q", "--no-input", "--disable-pip-version-check"]
+
+def _executar_uv(pacotes, uv):
+    """
+    Instala via "uv pip install -r" a partir de um requirements temporário
+    """
+    # delete=False: no Windows o arquivo não pode ser reaberto pelo uv enquanto estiver aberto aqui
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as tmp:
+        tmp.write("\n".join(pacotes) + "\n")
+    try:
+        subprocess.run(
+            _comando_instalacao(uv) + ["-r", tmp.name],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            check=True,
+            **_ARGS_SPAWN,
+        )
+    finally:
+        os.remove(tmp.name)
+
+def _wheelhouse_completa(pacotes):
+    """
+    Verifica se a wheelhouse já tem uma wheel para cada pacote pedido
+    """
+    try:
+        with os.scandir(PASTA_WHEELHOUSE) as entradas:
+            # Nome do arquivo: <distribuição>-<versão>-...whl
+            nomes = {_nome_canonico(e.name.split("-", 1)[0]) for e in entradas if e.name.endswith(".whl")}
+    except FileNotFoundError:
+        return False
+    return all(_nome_canonico(p) in nomes for p in pacotes)
+
+def _instalar_da_wheelhouse(pacotes):
+    """
+    Baixa as wheels para a wheelhouse (só se faltar alguma) e instala sem consultar o índice
+    Levanta CalledProcessError se o download ou a instalação falharem
+    """
+    argumentos = {"stdout": subprocess.DEVNULL, "stderr": subprocess.PIPE, "check": True, **_ARGS_SPAWN}
+    if not _wheelhouse_completa(pacotes):
+        subprocess.run(
+            [sys.executable, "-m", "pip", "download", "-q", "--no-input", "--disable-pip-version-check",
+             "-d", PASTA_WHEELHOUSE] + list(pacotes),
+            **argumentos,
+        )
+    subprocess.run(
+        _comando_instalacao() + ["--no-index", "--find-links", PASTA_WHEELHOUSE] + list(pacotes),
+        **argumentos,
+    )
+
+def _executar_pip(pacotes):
+    """
+    Executa "pip install" em modo silencioso e sem prompts
+    Usa o uv quando estiver no PATH (resolução e downloads bem mais rápidos)
+    Só a saída de erro é capturada; levanta CalledProcessError em caso de falha
+    """
+    uv = shutil.which("uv")
+    if uv is not None:
+        _executar_uv(pacotes, uv)
+        return
+    
+    # Primeiro tenta pela wheelhouse local (baixada uma única vez): execuções seguintes não usam a rede
+    try:
+        _instalar_da_wheelhouse(pacotes)
+        return
+    except subprocess.CalledProcessError:
+        pass  # sem rede para baixar ou wheelhouse incompleta: instala pelo índice normalmente
+    
+    subprocess.run(
+        _comando_instalacao() + list(pacotes),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=True,
+        **_ARGS_SPAWN,
+    )
+
+async def _instalar_pacote(dep, limite, uv):
+    """
+    Instala um único pacote, repassando a saída de erro em tempo real com o nome do pacote
+    Retorna (pacote, código de saída)
+    """
+    async with limite:
+        proc = await asyncio.create_subprocess_exec(
+            *_comando_instalacao(uv), dep,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            **_ARGS_SPAWN,
+        )
+        async for linha in proc.stderr:
+            print(f"[{dep}] {linha.decode(errors='replace').rstrip()}")
+        return dep, await proc.wait()
+
+async def _instalar_individualmente(dependencias):
+    """
+    Instala os pacotes um a um, concorrentemente (até 4, para não sobrecarregar o PyPI)
+    Retorna a lista de (pacote, código de saída) que falharam
+    """
+    limite = asyncio.Semaphore(4)
+    uv = shutil.which("uv")
+    resultados = await asyncio.gather(*(_instalar_pacote(dep, limite, uv) for dep in dependencias))
+    return [(dep, codigo) for dep, codigo in resultados if codigo != 0]
+
+def _escrever_linhas(linhas):
+    """
+    Escreve as linhas de status de uma vez (uma escrita em vez de um print por pacote;
+    consoles do Windows são lentos para muitas escritas pequenas)
+    """
+    if linhas:
+        sys.stdout.write("\n".join(linhas) + "\n")
+
+def _nome_canonico(dep):
+    """
+    Nome normalizado do pacote (PEP 503) a partir da especificação, ex.: "Foo_Bar>=1" -> "foo-bar"
+    """
+    return re.sub(r"[-_.]+", "-", re.match(r"[A-Za-z0-9._-]+", dep).group()).lower()
+
+def _versao_numerica(texto):
+    """
+    Parte numérica inicial de uma versão como tupla, ex.: "2.4.0rc1" -> (2, 4, 0)
+    """
+    return tuple(int(p) for p in re.match(r"\d+(?:\.\d+)*", texto).group().split("."))
+
+def _pre_versao(texto):
+    """
+    Indica se a versão é uma pré-versão (a, b, rc ou dev logo após a parte numérica), ex.: "2.0.0rc1"
+    """
+    resto = texto[re.match(r"\d+(?:\.\d+)*", texto).end():]
+    return re.match(r"[-_.]?(?:a|b|c|rc|alpha|beta|pre|preview|dev)", resto, re.IGNORECASE) is not None
+
+def _versao_atende(instalada, minima):
+    """
+    Compara versões numéricas completando com zeros (1.5 == 1.5.0)
+    Como no pip, uma pré-versão fica abaixo da versão final: 2.0.0rc1 não atende >=2.0.0
+    """
+    a, b = _versao_numerica(instalada), _versao_numerica(minima)
+    tamanho = max(len(a), len(b))
+    a, b = a + (0,) * (tamanho - len(a)), b + (0,) * (tamanho - len(b))
+    return a > b or (a == b and not _pre_versao(instalada))
+
+def _dependencias_faltantes(dependencias):
+    """
+    Filtra as dependências que ainda não estão instaladas na versão exigida
+    As especificações são do formato simples usado em DEPENDENCIAS ("nome" ou "nome>=versão");
+    qualquer outra é repassada ao pip
+    """
+    faltantes = []
+    satisfeitos = []
+    for dep in dependencias:
+        spec = re.fullmatch(r"([A-Za-z0-9._-]+)\s*(?:>=\s*(\d+(?:\.\d+)*))?", dep.strip())
+        if spec is None:
+            faltantes.append(dep)
+            continue
+        nome, minima = spec.groups()
+        try:
+            instalada = version(nome)
+        except PackageNotFoundError:
+            faltantes.append(dep)
+            continue
+        if minima is None or (re.match(r"\d", instalada) and _versao_atende(instalada, minima)):
+            satisfeitos.append(f"✓ {dep} já satisfeito ({instalada})")
+        else:
+            faltantes.append(dep)
+    _escrever_linhas(satisfeitos)
+    return faltantes
 
 def instalar_dependencias():
     """
@@ -12,68 +214,143 @@ def instalar_dependencias():
     """
     print("Instalando dependências...")
     
-    dependencias = [
-        "pandas>=1.5.0",
-        "numpy>=1.21.0", 
-        "pulp>=2.7.0",
-        "openpyxl>=3.0.0",
-        "xlrd>=2.0.0",
-        "geopy>=2.2.0",
-    ]
+    # Só vão para o pip os pacotes ausentes ou em versão incompatível
+    dependencias = _dependencias_faltantes(DEPENDENCIAS)
+    if not dependencias:
+        print("✓ Dependências instaladas com sucesso!")
+        return True
     
-    for dep in dependencias:
-        try:
-            print(f"Instalando {dep}...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", dep])
-        except subprocess.CalledProcessError as e:
-            print(f"Erro ao instalar {dep}: {e}")
+    _escrever_linhas([f"Instalando {dep}..." for dep in dependencias])
+    
+    # Uma única chamada ao pip: uma inicialização e uma resolução para todo o conjunto
+    try:
+        _executar_pip(dependencias)
+    except subprocess.CalledProcessError:
+        # Se a instalação em lote falhar, instala pacote a pacote para identificar o problema
+        # As instalações são limitadas pela rede, então rodam concorrentemente num laço de eventos
+        print("Falha na instalação em lote; instalando um pacote por vez...")
+        falhas = asyncio.run(_instalar_individualmente(dependencias))
+        for dep, codigo in falhas:
+            print(f"Erro ao instalar {dep}: código de saída {codigo}")
+        if falhas:
             return False
     
     print("✓ Dependências instaladas com sucesso!")
     return True
 
-def verificar_glpk():
+# Resultados de verificações anteriores (ex.: GLPK), reaproveitados entre execuções do setup
+ARQUIVO_CACHE_SETUP = os.path.join(os.path.expanduser("~"), ".ifood_setup_cache.json")
+
+def _carregar_cache_setup():
+    """
+    Lê o cache do setup; retorna um dicionário vazio se não existir ou estiver corrompido
+    """
+    try:
+        with open(ARQUIVO_CACHE_SETUP, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _salvar_cache_setup(cache):
+    """
+    Grava o cache do setup (falhas de escrita são ignoradas)
+    """
+    try:
+        with open(ARQUIVO_CACHE_SETUP, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+    except OSError:
+        pass
+
+def _chave_glpk(caminho):
+    """
+    Identifica a instalação do GLPK pelo caminho e data de modificação do glpsol
+    """
+    return f"{caminho}|{os.path.getmtime(caminho)}"
+
+def _instrucoes_glpk():
+    """
+    Mostra como instalar o GLPK em cada sistema
+    """
+    print("\nINSTRUÇÕES PARA INSTALAR GLPK:")
+    print("─" * 40)
+    print("Windows:")
+    print("1. Baixe GLPK em: https://www.gnu.org/software/glpk/")
+    print("2. Extraia para C:\\glpk")
+    print("3. Adicione C:\\glpk\\w64 ao PATH")
+    print()
+    print("Linux (Ubuntu/Debian):")
+    print("sudo apt-get install glpk-utils")
+    print()
+    print("macOS:")
+    print("brew install glpk")
+    print()
+
+@functools.lru_cache(maxsize=None)
+def _get_pulp():
+    """
+    Importa o PuLP uma única vez, sob demanda
+    Não pode ficar no topo do módulo: o setup roda antes das dependências estarem instaladas
+    """
+    import pulp
+    return pulp
+
+def _resolver_lp_teste():
+    """
+    Resolve um PL trivial com o GLPK pelo PuLP (verificação completa)
+    """
+    pulp = _get_pulp()
+    # Tenta criar um solver GLPK
+    solver = pulp.GLPK_CMD(msg=0)
+    
+    # Teste simples
+    prob = pulp.LpProblem("teste", pulp.LpMinimize)
+    x = pulp.LpVariable("x", lowBound=0)
+    prob += x
+    prob += x >= 1
+    
+    return prob.solve(solver) == pulp.LpStatusOptimal
+
+def verificar_glpk(deep_check=False):
     """
     Verifica se o GLPK está instalado
+    Por padrão basta encontrar o glpsol e executar "glpsol --version";
+    com deep_check=True (opção --deep-check) resolve um PL de teste pelo PuLP.
+    Um teste bem-sucedido fica em cache até o binário glpsol mudar
     """
     print("Verificando instalação do GLPK...")
     
+    caminho = shutil.which("glpsol")
+    if caminho is None:
+        print("✗ GLPK não encontrado (glpsol não está no PATH)")
+        _instrucoes_glpk()
+        return False
+    
+    nivel = "completa" if deep_check else "versao"
+    chave = _chave_glpk(caminho)
+    cache = _carregar_cache_setup()
+    em_cache = cache.get("glpk", {})
+    if em_cache.get("chave") == chave and em_cache.get("ok") and (not deep_check or em_cache.get("nivel") == "completa"):
+        print("✓ GLPK está funcionando corretamente! (verificação em cache)")
+        return True
+    
     try:
-        import pulp
-        # Tenta criar um solver GLPK
-        solver = pulp.GLPK_CMD(msg=0)
-        
-        # Teste simples
-        prob = pulp.LpProblem("teste", pulp.LpMinimize)
-        x = pulp.LpVariable("x", lowBound=0)
-        prob += x
-        prob += x >= 1
-        
-        status = prob.solve(solver)
-        
-        if status == pulp.LpStatusOptimal:
-            print("✓ GLPK está funcionando corretamente!")
-            return True
+        if deep_check:
+            ok = _resolver_lp_teste()
         else:
-            print("⚠ GLPK encontrado mas com problemas")
-            return False
-            
+            ok = subprocess.run([caminho, "--version"], capture_output=True, timeout=2, **_ARGS_SPAWN).returncode == 0
     except Exception as e:
         print(f"✗ Erro com GLPK: {e}")
-        print("\nINSTRUÇÕES PARA INSTALAR GLPK:")
-        print("─" * 40)
-        print("Windows:")
-        print("1. Baixe GLPK em: https://www.gnu.org/software/glpk/")
-        print("2. Extraia para C:\\glpk")
-        print("3. Adicione C:\\glpk\\w64 ao PATH")
-        print()
-        print("Linux (Ubuntu/Debian):")
-        print("sudo apt-get install glpk-utils")
-        print()
-        print("macOS:")
-        print("brew install glpk")
-        print()
+        _instrucoes_glpk()
         return False
+    
+    if ok:
+        print("✓ GLPK está funcionando corretamente!")
+        cache["glpk"] = {"chave": chave, "ok": True, "nivel": nivel}
+        _salvar_cache_setup(cache)
+        return True
+    
+    print("⚠ GLPK encontrado mas com problemas")
+    return False
 
 def verificar_arquivos():
     """
@@ -81,22 +358,25 @@ def verificar_arquivos():
     """
     print("Verificando arquivos de dados...")
     
-    arquivos_necessarios = [
-        "restaurantes.csv",
-        "entregadores.csv", 
-        "pedidos.csv"
-    ]
-    
     arquivos_encontrados = []
     arquivos_faltantes = []
     
-    for arquivo in arquivos_necessarios:
-        if os.path.exists(arquivo):
-            print(f"✓ {arquivo}")
-            arquivos_encontrados.append(arquivo)
-        else:
+    # Uma única leitura do diretório em vez de um stat por arquivo;
+    # a varredura para assim que todos os arquivos necessários forem vistos
+    pendentes = set(ARQUIVOS_NECESSARIOS)
+    with os.scandir('.') as entradas:
+        for entrada in entradas:
+            pendentes.discard(entrada.name)
+            if not pendentes:
+                break
+    
+    for arquivo in ARQUIVOS_NECESSARIOS:
+        if arquivo in pendentes:
             print(f"✗ {arquivo}")
             arquivos_faltantes.append(arquivo)
+        else:
+            print(f"✓ {arquivo}")
+            arquivos_encontrados.append(arquivo)
     
     if arquivos_faltantes:
         print(f"\n⚠ {len(arquivos_faltantes)} arquivo(s) faltante(s):")
@@ -105,98 +385,32 @@ def verificar_arquivos():
         print("\nCertifique-se de que os arquivos estão no mesmo diretório do script.")
         return False
     
-    print(f"\n✓ Todos os {len(arquivos_necessarios)} arquivos encontrados!")
+    print(f"\n✓ Todos os {len(ARQUIVOS_NECESSARIOS)} arquivos encontrados!")
     return True
 
 def criar_exemplo_uso():
     """
     Cria script de exemplo de uso
     """
-    exemplo = '''#!/usr/bin/env python3
-"""
-Exemplo de uso do otimizador iFood
-"""
-
-from ifood_optimizer import IFoodDeliveryOptimizer
-
-def exemplo_completo():
-    """
-    Exemplo de uso completo do otimizador
-    """
-    print("=== EXEMPLO DE USO - OTIMIZADOR IFOOD ===\\n")
-    
-    # Criar otimizador
-    otimizador = IFoodDeliveryOptimizer()
+    # O conteúdo fica em templates/exemplo_uso.py.tmpl; a cópia é feita pelo kernel quando possível
+    modelo = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "exemplo_uso.py.tmpl")
     
-    # Carregar dados
-    print("1. Carregando dados...")
-    if not otimizador.carregar_dados(
-        "restaurantes.csv",
-        "entregadores.csv", 
-        "pedidos.csv"
-    ):
-        print("Erro ao carregar dados!")
+    # Se o arquivo já está igual ao modelo não há o que gravar (mantém a data de modificação)
+    # filecmp compara o tamanho antes de ler o conteúdo
+    if os.path.isfile("exemplo_uso.py") and filecmp.cmp(modelo, "exemplo_uso.py", shallow=False):
+        print("✓ Arquivo exemplo_uso.py já está atualizado")
         return
     
-    # Preprocessar
-    print("2. Preprocessando dados...")
-    otimizador.preprocessar_dados()
-    
-    # Criar modelo
-    print("3. Criando modelo de otimização...")
-    otimizador.criar_modelo()
-    
-    # Resolver
-    print("4. Resolvendo modelo...")
-    if otimizador.resolver_modelo():
-        print("5. Exportando resultados...")
-        otimizador.exportar_resultados("resultado_exemplo.json")
-        
-        print("6. Gerando relatório...")
-        otimizador.gerar_relatorio()
-        
-        print("\\n✓ Exemplo executado com sucesso!")
-    else:
-        print("✗ Falha na resolução do modelo")
-
-def exemplo_rapido():
-    """
-    Exemplo rápido para teste
-    """
-    print("=== TESTE RÁPIDO ===\\n")
-    
-    otimizador = IFoodDeliveryOptimizer()
-    
-    # Carregar apenas primeiros registros para teste rápido
-    if otimizador.carregar_dados(
-        "restaurantes.csv",
-        "entregadores.csv",
-        "pedidos.csv"
-    ):
-        # Limitar dados para teste rápido
-        otimizador.entregadores = otimizador.entregadores.head(10)
-        otimizador.pedidos = otimizador.pedidos.head(20)
-        
-        otimizador.preprocessar_dados()
-        otimizador.criar_modelo()
-        
-        if otimizador.resolver_modelo():
-            print("✓ Teste rápido passou!")
-            print(f"Tempo médio: {otimizador.resultado['tempo_medio']:.1f} min")
-        else:
-            print("✗ Teste rápido falhou")
-
-if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1 and sys.argv[1] == "rapido":
-        exemplo_rapido()
-    else:
-        exemplo_completo()
-'''
-    
-    with open("exemplo_uso.py", "w", encoding="utf-8") as f:
-        f.write(exemplo)
+    # Copia para um temporário no mesmo diretório e troca de uma vez (nunca fica pela metade)
+    fd, tmp = tempfile.mkstemp(prefix=".exemplo_uso.", suffix=".tmp", dir=".")
+    os.close(fd)
+    try:
+        shutil.copyfile(modelo, tmp)
+        shutil.copymode(modelo, tmp)  # mkstemp cria o arquivo com permissão 0600
+        os.replace(tmp, "exemplo_uso.py")
+    except BaseException:
+        os.remove(tmp)
+        raise
     
     print("✓ Arquivo exemplo_uso.py criado!")
 
@@ -215,7 +429,7 @@ def main():
     print()
     
     # 2. Verificar GLPK
-    glpk_ok = verificar_glpk()
+    glpk_ok = verificar_glpk(deep_check="--deep-check" in sys.argv)
     
     print()
     
@@ -0,0 +1,81 @@
+"""
+Testes da geolocalização offline de CEPs (pgeocode)
+Executar com: python -m unittest test_geocodificacao
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import ifood_optimizer
+from ifood_optimizer import IFoodDeliveryOptimizer
+
+
+class _BaseFalsa:
+    """
+    Substitui pgeocode.Nominatim: busca exata por código, como o pgeocode faz
+    """
+    CODIGOS = {
+        '01001-000': (-23.5489, -46.6388),  # Praça da Sé, São Paulo
+        '36010-000': (-21.7642, -43.3496),  # Centro, Juiz de Fora (código genérico do setor)
+    }
+
+    def __init__(self, pais):
+        self.consultas = []
+
+    def query_postal_code(self, codigos):
+        codigos = list(codigos)
+        self.consultas.append(codigos)
+        coords = [self.CODIGOS.get(c, (np.nan, np.nan)) for c in codigos]
+        return pd.DataFrame({
+            'postal_code': codigos,
+            'latitude': [lat for lat, _ in coords],
+            'longitude': [lon for _, lon in coords],
+        })
+
+
+class TesteGeocodificacaoOffline(unittest.TestCase):
+    def setUp(self):
+        self._pgeocode_original = ifood_optimizer.pgeocode
+        ifood_optimizer.pgeocode = type('pgeocode', (), {'Nominatim': _BaseFalsa})
+        self.otimizador = IFoodDeliveryOptimizer(arquivo_cache_cep=None)
+
+    def tearDown(self):
+        ifood_optimizer.pgeocode = self._pgeocode_original
+
+    def test_consulta_no_formato_da_base(self):
+        resolvidos = self.otimizador._geocodificar_offline({'01001000'})
+        self.assertEqual(resolvidos, {'01001000'})
+        self.assertEqual(self.otimizador._geocoder_offline.consultas, [['01001-000']])
+        self.assertEqual(self.otimizador.cep_cache['01001000'], (-23.5489, -46.6388))
+
+    def test_cep_sem_zero_a_esquerda(self):
+        # CEP lido como número: 01001000 -> 1001000
+        self.assertEqual(self.otimizador._geocodificar_offline({'1001000'}), {'1001000'})
+
+    def test_cep_fora_da_base_usa_o_setor(self):
+        resolvidos = self.otimizador._geocodificar_offline({'36010123', '99999999'})
+        self.assertEqual(resolvidos, {'36010123'})
+        self.assertEqual(self.otimizador._geocoder_offline.consultas,
+                         [['36010-123', '99999-999'], ['36010-000', '99999-000']])
+
+
+@unittest.skipIf(ifood_optimizer.pgeocode is None, "pgeocode não instalado")
+class TesteBaseGeoNames(unittest.TestCase):
+    def test_cep_conhecido(self):
+        try:
+            base = ifood_optimizer.pgeocode.Nominatim('br')
+        except Exception as e:
+            self.skipTest(f"base do pgeocode indisponível: {e}")
+        otimizador = IFoodDeliveryOptimizer(arquivo_cache_cep=None)
+        otimizador._geocoder_offline = base
+
+        # Praça da Sé, São Paulo
+        self.assertEqual(otimizador._geocodificar_offline({'01001000'}), {'01001000'})
+        lat, lon = otimizador.cep_cache['01001000']
+        self.assertTrue(-24.0 < lat < -23.0 and -47.0 < lon < -46.0)
+
+
+if __name__ == '__main__':
+    unittest.main()